@@ -1,53 +1,336 @@
 import { NextResponse } from 'next/server'
 import { MongoClient, ObjectId } from 'mongodb'
 import { v4 as uuidv4 } from 'uuid'
-
-let client
+import { ApiError } from '@/lib/errors'
+import INDEXES from '@/lib/indexes.json'
+import { eventStream, publish } from '@/lib/events'
+import { emailStatus, enqueueEmail, startEmailWorker } from '@/lib/mailer'
+import { bumpVersions, conditionalJson } from '@/lib/conditional'
+import { errorFields, logger } from '@/lib/logger'
+import { instrument, outsideRequest, watchCommands } from '@/lib/timing'
+import { metricsAuthorized, metricsEnabled, runtimeMetrics, watchPool } from '@/lib/metrics'
+import { idempotent } from '@/lib/idempotency'
+import { findPage, MAX_LIMIT, sinceToken } from '@/lib/pagination'
+import { peaksResponse } from '@/lib/peaks'
+import { DELETED, NOT_DELETED, purgeProgress, purgingProjects, scheduleProjectPurge, startPurgeWorker } from '@/lib/purge'
+import { TtlCache } from '@/lib/cache'
+import { createInvalidationBus } from '@/lib/invalidation'
+import {
+  backfillStudioCalendars, bookableSlot, releaseSessions, releaseSlot, reserveSlot, reserveSlots, restoreSlot,
+  studioAvailability
+} from '@/lib/bookings'
+import { executeBulk, parseBulkBody } from '@/lib/bulk'
+import { backfillSessionTimes, calendarQuery, currentWeek, sessionTimes, withSessionTimes } from '@/lib/calendar'
+import { legacyUploadId, receiveChunk, removeStoredFile, uploadStatus } from '@/lib/uploads'
+
+let connecting
 let db
+let invalidations
+
+// Every lookup goes through the app-level `id` or a projectId/fileId filter,
+// so the indexes in lib/indexes.json are created once per process on first connect.
+// createIndex is a no-op for indexes that already exist. Each index is created
+// on its own, so one that can't be built doesn't keep the others from being.
+async function ensureIndexes(db) {
+  await Promise.all(Object.entries(INDEXES).flatMap(([name, indexes]) =>
+    indexes.map(({ key, ...options }) => db.collection(name).createIndex(key, options).catch((error) => {
+      // A bad index (e.g. duplicate ids in old data) must not take the API down
+      logger.error('Index creation failed', { collection: name, index: { key, ...options }, ...errorFields(error, false) })
+    }))
+  ))
+}
+
+// Dashboard stats are a single shared entry. Writes to the collections they
+// count drop it on every instance through the invalidation bus.
+const DASHBOARD_STATS_TTL_MS = Number(process.env.DASHBOARD_STATS_TTL_MS || 30000)
+const DASHBOARD_COLLECTIONS = new Set(['projects', 'sessions', 'invoices', 'audioFiles'])
+const DASHBOARD_STATS_KEY = 'stats'
+const dashboardCache = new TtlCache(DASHBOARD_STATS_TTL_MS)
+
+// Project detail is the most requested read. PUT and DELETE invalidate the
+// entry on every instance through the invalidation bus; the TTL bounds
+// anything the bus misses, such as writes made straight to the database.
+const PROJECT_CACHE_TTL_MS = Number(process.env.PROJECT_CACHE_TTL_MS || 60000)
+const PROJECT_CACHE_MAX_ENTRIES = Number(process.env.PROJECT_CACHE_MAX_ENTRIES || 10000)
+const projectCache = new TtlCache(PROJECT_CACHE_TTL_MS, PROJECT_CACHE_MAX_ENTRIES)
+const INVALIDATED_CACHES = { projects: projectCache, dashboard: dashboardCache }
+
+function applyInvalidation({ cache, keys }) {
+  if (!cache) {
+    Object.values(INVALIDATED_CACHES).forEach((target) => target.clear())
+    return
+  }
+  const target = INVALIDATED_CACHES[cache]
+  for (const key of keys || []) target?.invalidate(key)
+}
 
-async function connectDB() {
-  if (!client) {
-    client = new MongoClient(process.env.MONGO_URL)
+// Awaited so this instance can no longer serve the old document by the time
+// the write responds
+async function projectsChanged(...ids) {
+  await invalidations.publish({ cache: 'projects', keys: ids })
+}
+
+// Called after every successful write so derived caches drop stale data. The
+// version bump is awaited so a conditional GET after the write sees it.
+async function collectionsChanged(...names) {
+  await Promise.all([
+    names.some((name) => DASHBOARD_COLLECTIONS.has(name)) &&
+      invalidations.publish({ cache: 'dashboard', keys: [DASHBOARD_STATS_KEY] }),
+    bumpVersions(db, names)
+  ])
+}
+
+async function computeDashboardStats(db) {
+  const week = currentWeek()
+  const [projectCount, tombstoned, weekSessions, totalRevenue, filesProcessed] = await Promise.all([
+    db.collection('projects').estimatedDocumentCount(),
+    // The estimate includes tombstoned projects for as long as their documents
+    // exist; the sparse deletedAt index counts exactly those
+    db.collection('projects').countDocuments(DELETED),
+    db.collection('sessions').countDocuments({ startsAt: { $gte: week.start, $lt: week.end } }),
+    db.collection('invoices').aggregate([
+      { $match: { status: 'paid' } },
+      { $group: { _id: null, total: { $sum: '$amount' } } }
+    ]).toArray(),
+    db.collection('audioFiles').estimatedDocumentCount()
+  ])
+  return {
+    activeProjects: Math.max(0, projectCount - tombstoned),
+    weekSessions,
+    monthRevenue: totalRevenue[0]?.total || 0,
+    filesProcessed
+  }
+}
+
+const SLOT_FIELDS = ['studio', 'date', 'startTime', 'endTime']
+
+const PURGING_ERROR = 'Project is being deleted'
+
+// Messages, comments and files written under a project that is being purged
+// would outlive it. Checking again after the insert catches a purge that
+// started in between and may already have swept this collection.
+async function insertUnderProject(db, collection, doc) {
+  const purging = async () => (await purgingProjects(db, [doc.projectId])).size > 0
+  if (await purging()) throw new ApiError(PURGING_ERROR, 409)
+  await db.collection(collection).insertOne(doc)
+  if (await purging()) {
+    await db.collection(collection).deleteOne({ id: doc.id })
+    throw new ApiError(PURGING_ERROR, 409)
+  }
+}
+
+// beforeCreates hook for bulk endpoints whose documents belong to a project
+async function refusePurgingProjects(db, docs) {
+  const purging = await purgingProjects(db, docs.map((doc) => doc.projectId))
+  return new Map(docs.filter((doc) => purging.has(doc.projectId)).map((doc) => [doc.id, PURGING_ERROR]))
+}
+
+// Batch endpoints: POST <path> with an operations array, one bulkWrite per request
+const BULK_ENDPOINTS = {
+  'sessions/bulk': {
+    collection: 'sessions',
+    create: (data) => withSessionTimes({ id: uuidv4(), ...data, createdAt: new Date(), updatedAt: new Date() }),
+    // Bulk creates book their studio slot like POST sessions; moving a booking
+    // needs the old slot, so that stays with PUT sessions/{id}
+    hooks: (db) => ({
+      beforeCreates: (sessions) => reserveSlots(db, sessions
+        .map((session) => ({ sessionId: session.id, slot: bookableSlot(session) }))
+        .filter((request) => request.slot)),
+      createFailed: (sessions) => releaseSessions(db, sessions.map((session) => session.id)),
+      beforeUpdate: (id, data) => {
+        if (SLOT_FIELDS.some((field) => field in data)) {
+          throw new ApiError('Reschedule sessions with PUT sessions/{id}')
+        }
+      },
+      afterDelete: (ids) => releaseSessions(db, ids)
+    })
+  },
+  'audio-files/bulk': {
+    collection: 'audioFiles',
+    create: (data) => ({ id: uuidv4(), ...data, uploadedAt: new Date() }),
+    // Same cleanup as DELETE audio-files/{id}
+    hooks: (db) => ({
+      beforeCreates: (files) => refusePurgingProjects(db, files),
+      deleteProjection: { storagePath: 1, 'peaks.path': 1 },
+      afterDelete: async (ids, files) => {
+        await Promise.all(files.flatMap((file) => [removeStoredFile(file.storagePath), removeStoredFile(file.peaks?.path)]))
+        await db.collection('comments').deleteMany({ fileId: { $in: ids } })
+        await collectionsChanged('comments')
+      }
+    })
+  },
+  'comments/bulk': {
+    collection: 'comments',
+    create: (data) => ({ id: uuidv4(), ...data, createdAt: new Date() }),
+    hooks: (db) => ({
+      beforeCreates: (comments) => refusePurgingProjects(db, comments)
+    })
+  }
+}
+
+// Parses the from/to query parameters (seconds into the file) into a range filter
+function timestampWindow(searchParams) {
+  const range = {}
+  for (const [param, op] of [['from', '$gte'], ['to', '$lt']]) {
+    const raw = searchParams.get(param)
+    if (raw === null) continue
+    const value = Number(raw)
+    if (raw.trim() === '' || !Number.isFinite(value)) {
+      throw new ApiError(`${param} must be a number of seconds`)
+    }
+    range[op] = value
+  }
+  if (Object.keys(range).length === 0) return null
+  if (range.$gte !== undefined && range.$lt !== undefined && range.$gte > range.$lt) {
+    throw new ApiError('from must not be after to')
+  }
+  return range
+}
+
+// One promise covers connecting, the indexes and the workers, so concurrent
+// first requests share it instead of racing a half-initialised client. A
+// failure is not cached: the next request starts over.
+function connectDB() {
+  if (!connecting) {
+    connecting = openDatabase().catch((error) => {
+      connecting = null
+      throw error
+    })
+  }
+  return connecting
+}
+
+async function openDatabase() {
+  const client = new MongoClient(process.env.MONGO_URL, { monitorCommands: true })
+  watchCommands(client)
+  watchPool(client)
+  let connected
+  try {
     await client.connect()
-    db = client.db(process.env.DB_NAME)
+    connected = client.db(process.env.DB_NAME)
+    await ensureIndexes(connected)
+  } catch (error) {
+    await client.close().catch(() => {})
+    throw error
   }
+  db = connected
+  // The bus and the workers run for good; that isn't part of this request.
+  // Purge jobs interrupted by a restart resume once the indexes are in place.
+  outsideRequest(() => {
+    invalidations = createInvalidationBus(db)
+    invalidations.subscribe(applyInvalidation)
+    startPurgeWorker(db, collectionsChanged)
+    startEmailWorker(db)
+    backfillSessionTimes(db, collectionsChanged).catch((error) => {
+      logger.error('Session startsAt backfill failed', errorFields(error))
+    })
+    backfillStudioCalendars(db).catch((error) => {
+      logger.error('Studio calendar backfill failed', errorFields(error))
+    })
+  })
   return db
 }
 
-// GET handler
-export async function GET(request, { params }) {
+// ApiErrors are the client's problem and go back with their status; anything
+// else is logged with its stack and becomes a 500
+function errorResponse(method, params, error) {
+  const path = params.path?.join('/') || ''
+  if (error instanceof ApiError) {
+    logger.debug(`${method} rejected`, { path, status: error.status, ...errorFields(error, false) })
+    return NextResponse.json({ success: false, error: error.message }, { status: error.status })
+  }
+  logger.error(`${method} failed`, { path, ...errorFields(error) })
+  return NextResponse.json({ success: false, error: error.message }, { status: 500 })
+}
+
+async function handleGetRequest(request, { params }) {
   try {
     const db = await connectDB()
     const path = params.path?.join('/') || ''
     const url = new URL(request.url)
     const searchParams = new URLSearchParams(url.search)
 
-    console.log('GET request to:', path)
-
     if (path === 'projects') {
-      const projects = await db.collection('projects').find({}).toArray()
-      return NextResponse.json({ success: true, data: projects })
+      return await conditionalJson(request, db, ['projects'], async () => {
+        const page = await findPage(db.collection('projects'), NOT_DELETED, searchParams)
+        return { success: true, ...page }
+      })
     }
 
     if (path === 'sessions') {
-      const sessions = await db.collection('sessions').find({}).toArray()
-      return NextResponse.json({ success: true, data: sessions })
+      // Calendar views ask for a window (and maybe a studio or engineer) in start order
+      const calendar = calendarQuery(searchParams)
+      return await conditionalJson(request, db, ['sessions'], async () => {
+        const page = await findPage(db.collection('sessions'), calendar || {}, searchParams,
+          calendar ? { sortField: 'startsAt' } : undefined)
+        return { success: true, ...page }
+      })
+    }
+
+    if (path === 'availability') {
+      const days = await studioAvailability(db, searchParams)
+      return NextResponse.json({ success: true, data: days })
+    }
+
+    if (path.startsWith('emails/')) {
+      const email = await emailStatus(db, path.split('/')[1])
+      if (!email) {
+        return NextResponse.json({ success: false, error: 'Email not found' }, { status: 404 })
+      }
+      return NextResponse.json({ success: true, data: email })
+    }
+
+    if (path.startsWith('upload/')) {
+      const uploadId = path.split('/')[1]
+      const status = await uploadStatus(db, uploadId)
+      if (!status) {
+        return NextResponse.json({ success: false, error: 'Upload not found' }, { status: 404 })
+      }
+      return NextResponse.json({ success: true, data: status })
+    }
+
+    if (path.startsWith('projects/') && path.endsWith('/purge')) {
+      const projectId = path.split('/')[1]
+      const job = await db.collection('purgeJobs').findOne({ projectId })
+      if (!job) {
+        return NextResponse.json({ success: false, error: 'Purge job not found' }, { status: 404 })
+      }
+      return NextResponse.json({ success: true, data: purgeProgress(job) })
     }
 
     if (path.startsWith('projects/')) {
       const projectId = path.split('/')[1]
-      const project = await db.collection('projects').findOne({ id: projectId })
+      // Cache-Control: no-cache skips the cached copy and refreshes it
+      if (/no-cache/.test(request.headers.get('cache-control') || '')) projectCache.delete(projectId)
+      const [project, hit] = await projectCache.getOrCompute(projectId, () =>
+        db.collection('projects').findOne({ id: projectId, ...NOT_DELETED }, { projection: { _id: 0 } }))
       if (!project) {
+        // Not cached, so a project created under this id later is found at once
+        projectCache.delete(projectId)
         return NextResponse.json({ success: false, error: 'Project not found' }, { status: 404 })
       }
-      return NextResponse.json({ success: true, data: project })
+      return NextResponse.json({ success: true, data: project }, { headers: { 'X-Cache': hit ? 'HIT' : 'MISS' } })
+    }
+
+    if (path.startsWith('audio-files/') && path.endsWith('/peaks')) {
+      const fileId = path.split('/')[1]
+      const audioFile = await db.collection('audioFiles').findOne({ id: fileId }, { projection: { _id: 0, peaks: 1 } })
+      if (!audioFile) {
+        return NextResponse.json({ success: false, error: 'File not found' }, { status: 404 })
+      }
+      if (!audioFile.peaks) {
+        return NextResponse.json({ success: false, error: 'No waveform peaks for this file' }, { status: 404 })
+      }
+      return peaksResponse(audioFile.peaks, searchParams.get('level'))
     }
 
     if (path === 'audio-files') {
       const projectId = searchParams.get('projectId')
       const query = projectId ? { projectId } : {}
-      const audioFiles = await db.collection('audioFiles').find(query).toArray()
-      return NextResponse.json({ success: true, data: audioFiles })
+      return await conditionalJson(request, db, ['audioFiles'], async () => {
+        const page = await findPage(db.collection('audioFiles'), query, searchParams, { sortField: 'uploadedAt' })
+        return { success: true, ...page }
+      })
     }
 
     if (path === 'comments') {
@@ -57,262 +340,338 @@ export async function GET(request, { params }) {
       if (projectId) query.projectId = projectId
       if (fileId) query.fileId = fileId
       
-      const comments = await db.collection('comments').find(query).toArray()
-      return NextResponse.json({ success: true, data: comments })
+      // A file's comments are markers on its timeline: ordered by timestamp and
+      // optionally limited to the [from, to) window the player is showing
+      const range = timestampWindow(searchParams)
+      if (range && !fileId) {
+        throw new ApiError('from/to require a fileId')
+      }
+      if (range) query.timestamp = range
+      
+      return await conditionalJson(request, db, ['comments'], async () => {
+        const page = await findPage(db.collection('comments'), query, searchParams,
+          fileId ? { sortField: 'timestamp' } : undefined)
+        return { success: true, ...page }
+      })
     }
 
     if (path === 'messages') {
       const projectId = searchParams.get('projectId')
       const query = projectId ? { projectId } : {}
-      const messages = await db.collection('messages').find(query).sort({ createdAt: 1 }).toArray()
-      return NextResponse.json({ success: true, data: messages })
+      return await conditionalJson(request, db, ['messages'], async () => {
+        const page = await findPage(db.collection('messages'), query, searchParams)
+        // Clients resume incremental sync by passing this back as `since`
+        const newest = searchParams.get('order') === 'desc' ? page.data[0] : page.data[page.data.length - 1]
+        const since = newest ? sinceToken(newest) : searchParams.get('since')
+        return { success: true, ...page, since }
+      })
     }
 
-    if (path === 'invoices') {
-      const invoices = await db.collection('invoices').find({}).toArray()
-      return NextResponse.json({ success: true, data: invoices })
+    if (path === 'messages/stream') {
+      const projectId = searchParams.get('projectId')
+      if (!projectId) {
+        return NextResponse.json({ success: false, error: 'projectId is required' }, { status: 400 })
+      }
+      // Reconnecting EventSource clients send the last id they saw
+      const since = request.headers.get('last-event-id') || searchParams.get('since')
+      // The whole backlog is replayed, one page in memory at a time
+      const replay = since && (async function* () {
+        let cursor = since
+        for (;;) {
+          const replayParams = new URLSearchParams({ since: cursor, limit: String(MAX_LIMIT) })
+          const { data, pagination } = await findPage(db.collection('messages'), { projectId }, replayParams)
+          for (const message of data) {
+            cursor = sinceToken(message)
+            yield { id: cursor, event: 'message', data: message }
+          }
+          if (!pagination.hasMore) return
+        }
+      })
+      const stream = eventStream(`messages:${projectId}`, { signal: request.signal, replay })
+      return new Response(stream, {
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache, no-transform',
+          'Connection': 'keep-alive',
+          'X-Accel-Buffering': 'no'
+        }
+      })
     }
 
-    if (path === 'dashboard-stats') {
-      const projectCount = await db.collection('projects').countDocuments()
-      const sessionCount = await db.collection('sessions').countDocuments()
-      const thisMonthSessions = await db.collection('sessions').countDocuments({
-        createdAt: { $gte: new Date(new Date().getFullYear(), new Date().getMonth(), 1) }
+    if (path === 'invoices') {
+      return await conditionalJson(request, db, ['invoices'], async () => {
+        const page = await findPage(db.collection('invoices'), {}, searchParams)
+        return { success: true, ...page }
       })
-      const totalRevenue = await db.collection('invoices').aggregate([
-        { $match: { status: 'paid' } },
-        { $group: { _id: null, total: { $sum: '$amount' } } }
-      ]).toArray()
+    }
 
+    if (path === 'metrics' && metricsEnabled()) {
+      if (!metricsAuthorized(request)) throw new ApiError('Metrics need the METRICS_TOKEN bearer token', 401)
+      const window = searchParams.get('window')
+      if (window !== null && !/^[\w.-]{1,64}$/.test(window)) throw new ApiError('window must be 1-64 letters, digits, _, . or -')
       return NextResponse.json({
         success: true,
-        data: {
-          activeProjects: projectCount,
-          weekSessions: thisMonthSessions,
-          monthRevenue: totalRevenue[0]?.total || 0,
-          filesProcessed: 142
-        }
+        data: { ...runtimeMetrics(window), caches: { projects: projectCache.stats(), dashboard: dashboardCache.stats() } }
       })
     }
 
+    if (path === 'dashboard-stats') {
+      // The four reads run concurrently and the result is shared until a write invalidates it
+      const [stats, hit] = await dashboardCache.getOrCompute(DASHBOARD_STATS_KEY, () => computeDashboardStats(db))
+      return NextResponse.json({ success: true, data: stats }, { headers: { 'X-Cache': hit ? 'HIT' : 'MISS' } })
+    }
+
     return NextResponse.json({ success: false, error: 'Endpoint not found' }, { status: 404 })
 
   } catch (error) {
-    console.error('GET Error:', error)
-    return NextResponse.json({ success: false, error: error.message }, { status: 500 })
+    return errorResponse('GET', params, error)
   }
 }
 
-// POST handler
-export async function POST(request, { params }) {
-  try {
-    const db = await connectDB()
-    const path = params.path?.join('/') || ''
-    const body = await request.json()
+// Tells callers apart well enough to keep their legacy uploads of the same file separate
+function uploadClient(request) {
+  return [request.headers.get('x-forwarded-for'), request.headers.get('user-agent')].join('|')
+}
 
-    console.log('POST request to:', path, 'with body:', body)
+// JSON POST endpoints; ApiErrors propagate to POST's error handling. `client`
+// identifies the caller for uploads that carry no uploadId.
+async function handlePost(db, path, body, client) {
+  if (BULK_ENDPOINTS[path]) {
+    const { collection, create, hooks } = BULK_ENDPOINTS[path]
+    const operations = parseBulkBody(body)
+    const result = await executeBulk(db.collection(collection), operations, create, hooks?.(db))
+    if (result.summary.succeeded > 0) await collectionsChanged(collection)
+    return NextResponse.json({ success: result.summary.failed === 0, ...result })
+  }
 
-    if (path === 'projects') {
-      const project = {
-        id: uuidv4(),
-        ...body,
-        createdAt: new Date(),
-        updatedAt: new Date()
-      }
-      await db.collection('projects').insertOne(project)
-      return NextResponse.json({ success: true, data: project })
+  if (path === 'projects') {
+    const project = {
+      id: uuidv4(),
+      ...body,
+      createdAt: new Date(),
+      updatedAt: new Date()
     }
+    await db.collection('projects').insertOne(project)
+    await collectionsChanged('projects')
+    return NextResponse.json({ success: true, data: project })
+  }
 
-    if (path === 'sessions') {
-      const session = {
-        id: uuidv4(),
-        ...body,
-        createdAt: new Date(),
-        updatedAt: new Date()
-      }
+  if (path === 'sessions') {
+    const session = withSessionTimes({
+      id: uuidv4(),
+      ...body,
+      createdAt: new Date(),
+      updatedAt: new Date()
+    })
+    // The studio slot is booked first; an overlapping booking fails with 409
+    const slot = bookableSlot(session)
+    if (slot) await reserveSlot(db, session.id, slot)
+    try {
       await db.collection('sessions').insertOne(session)
-      
-      // Send confirmation email (fake for now)
-      console.log('Would send confirmation email for session:', session.id)
-      
-      return NextResponse.json({ success: true, data: session })
+    } catch (error) {
+      if (slot) await releaseSlot(db, session.id, slot)
+      throw error
     }
+    await collectionsChanged('sessions')
+    
+    return NextResponse.json({ success: true, data: session })
+  }
 
-    if (path === 'audio-files') {
-      const audioFile = {
-        id: uuidv4(),
-        ...body,
-        uploadedAt: new Date()
-      }
-      await db.collection('audioFiles').insertOne(audioFile)
-      return NextResponse.json({ success: true, data: audioFile })
+  if (path === 'audio-files') {
+    const audioFile = {
+      id: uuidv4(),
+      ...body,
+      uploadedAt: new Date()
     }
+    await insertUnderProject(db, 'audioFiles', audioFile)
+    await collectionsChanged('audioFiles')
+    return NextResponse.json({ success: true, data: audioFile })
+  }
 
-    if (path === 'comments') {
-      const comment = {
-        id: uuidv4(),
-        ...body,
-        createdAt: new Date()
-      }
-      await db.collection('comments').insertOne(comment)
-      return NextResponse.json({ success: true, data: comment })
+  if (path === 'comments') {
+    const comment = {
+      id: uuidv4(),
+      ...body,
+      createdAt: new Date()
     }
+    await insertUnderProject(db, 'comments', comment)
+    await collectionsChanged('comments')
+    return NextResponse.json({ success: true, data: comment })
+  }
 
-    if (path === 'messages') {
-      const message = {
-        id: uuidv4(),
-        ...body,
-        createdAt: new Date()
-      }
-      await db.collection('messages').insertOne(message)
-      return NextResponse.json({ success: true, data: message })
+  if (path === 'messages') {
+    const message = {
+      id: uuidv4(),
+      ...body,
+      createdAt: new Date()
     }
-
-    if (path === 'invoices') {
-      const invoice = {
-        id: uuidv4(),
-        ...body,
-        createdAt: new Date(),
-        status: 'pending'
-      }
-      await db.collection('invoices').insertOne(invoice)
-      return NextResponse.json({ success: true, data: invoice })
+    await insertUnderProject(db, 'messages', message)
+    await collectionsChanged('messages')
+    if (message.projectId) {
+      const { _id, ...data } = message
+      publish(`messages:${message.projectId}`, { id: sinceToken(message), event: 'message', data })
     }
+    return NextResponse.json({ success: true, data: message })
+  }
 
-    if (path === 'upload') {
-      // Handle chunked file upload
-      const { fileName, chunk, totalChunks, chunkIndex, projectId } = body
-      
-      // In a real implementation, you'd save chunks to a temporary location
-      // and combine them when all chunks are received
-      console.log(`Received chunk ${chunkIndex + 1}/${totalChunks} for file ${fileName}`)
-      
-      if (chunkIndex === totalChunks - 1) {
-        // Last chunk, finalize upload
-        const audioFile = {
-          id: uuidv4(),
-          name: fileName,
-          projectId,
-          size: chunk.length * totalChunks, // Approximate
-          uploadedAt: new Date(),
-          uploadedBy: 'Current User',
-          version: 'v1',
-          type: 'recording'
-        }
-        await db.collection('audioFiles').insertOne(audioFile)
-        return NextResponse.json({ success: true, data: audioFile, completed: true })
-      }
-      
-      return NextResponse.json({ success: true, progress: ((chunkIndex + 1) / totalChunks) * 100 })
+  if (path === 'invoices') {
+    const invoice = {
+      id: uuidv4(),
+      ...body,
+      createdAt: new Date(),
+      status: 'pending'
     }
+    await db.collection('invoices').insertOne(invoice)
+    await collectionsChanged('invoices')
+    return NextResponse.json({ success: true, data: invoice })
+  }
 
-    // Stripe payment endpoints (with fake processing)
-    if (path === 'stripe/create-payment-intent') {
-      const { amount, currency = 'usd' } = body
-      
-      // Fake Stripe payment intent
-      const paymentIntent = {
-        id: `pi_fake_${uuidv4()}`,
-        client_secret: `pi_fake_${uuidv4()}_secret`,
-        amount,
-        currency,
-        status: 'requires_payment_method'
-      }
-      
-      console.log('Fake Stripe payment intent created:', paymentIntent.id)
-      return NextResponse.json({ success: true, data: paymentIntent })
+  if (path === 'upload') {
+    // Handle chunked file upload: chunks are spooled to disk and assembled once all have arrived
+    const { fileName, chunk, totalChunks, chunkIndex, projectId, encoding } = body
+    if (chunk !== undefined && typeof chunk !== 'string') {
+      throw new ApiError('chunk must be a string')
     }
+    const uploadId = body.uploadId || await legacyUploadId(db, { projectId, fileName, chunkIndex, client })
 
-    if (path === 'stripe/confirm-payment') {
-      const { paymentIntentId } = body
-      
-      // Fake payment confirmation
-      console.log('Fake Stripe payment confirmed:', paymentIntentId)
-      
-      // Update invoice status
-      await db.collection('invoices').updateOne(
-        { paymentIntentId },
-        { $set: { status: 'paid', paidAt: new Date() } }
-      )
-      
-      return NextResponse.json({ success: true, message: 'Payment confirmed' })
-    }
+    logger.debug('Received chunk', { uploadId, chunk: chunkIndex + 1, totalChunks, fileName })
 
-    // PayPal payment endpoints (with fake processing)
-    if (path === 'paypal/create-order') {
-      const { amount, invoiceId } = body
-      
-      const orderId = `paypal_fake_${uuidv4()}`
-      console.log('Fake PayPal order created:', orderId)
-      
-      return NextResponse.json({ success: true, orderId })
-    }
+    const result = await receiveChunk(
+      db,
+      { uploadId, fileName, projectId, totalChunks, chunkIndex },
+      Buffer.from(chunk ?? '', encoding === 'base64' ? 'base64' : 'utf8')
+    )
+    if (result.completed) await collectionsChanged('audioFiles')
+    return NextResponse.json({ success: true, ...result })
+  }
 
-    if (path === 'paypal/capture-order') {
-      const { orderId, invoiceId } = body
-      
-      console.log('Fake PayPal order captured:', orderId)
-      
-      // Update invoice status
-      await db.collection('invoices').updateOne(
-        { id: invoiceId },
-        { $set: { status: 'paid', paidAt: new Date(), paypalOrderId: orderId } }
-      )
-      
-      return NextResponse.json({ success: true, message: 'Payment captured' })
+  // Stripe payment endpoints (with fake processing)
+  if (path === 'stripe/create-payment-intent') {
+    const { amount, currency = 'usd' } = body
+    
+    // Fake Stripe payment intent
+    const paymentIntent = {
+      id: `pi_fake_${uuidv4()}`,
+      client_secret: `pi_fake_${uuidv4()}_secret`,
+      amount,
+      currency,
+      status: 'requires_payment_method'
     }
+    
+    logger.info('Fake Stripe payment intent created', { paymentIntentId: paymentIntent.id })
+    return NextResponse.json({ success: true, data: paymentIntent })
+  }
 
-    // Email notification endpoints (with fake sending)
-    if (path === 'send-email') {
-      const { to, subject, type, data } = body
-      
-      console.log('Fake email sent:', { to, subject, type })
-      
-      // Log email to database
-      const emailLog = {
-        id: uuidv4(),
-        to,
-        subject,
-        type,
-        data,
-        sentAt: new Date(),
-        status: 'sent'
+  if (path === 'stripe/confirm-payment') {
+    const { paymentIntentId } = body
+    
+    // Fake payment confirmation
+    logger.info('Fake Stripe payment confirmed', { paymentIntentId })
+    
+    // Update invoice status
+    await db.collection('invoices').updateOne(
+      { paymentIntentId },
+      { $set: { status: 'paid', paidAt: new Date() } }
+    )
+    await collectionsChanged('invoices')
+    
+    return NextResponse.json({ success: true, message: 'Payment confirmed' })
+  }
+
+  // PayPal payment endpoints (with fake processing)
+  if (path === 'paypal/create-order') {
+    const { amount, invoiceId } = body
+    
+    const orderId = `paypal_fake_${uuidv4()}`
+    logger.info('Fake PayPal order created', { orderId, invoiceId })
+    
+    return NextResponse.json({ success: true, orderId })
+  }
+
+  if (path === 'paypal/capture-order') {
+    const { orderId, invoiceId } = body
+    
+    logger.info('Fake PayPal order captured', { orderId, invoiceId })
+    
+    // Update invoice status
+    await db.collection('invoices').updateOne(
+      { id: invoiceId },
+      { $set: { status: 'paid', paidAt: new Date(), paypalOrderId: orderId } }
+    )
+    await collectionsChanged('invoices')
+    
+    return NextResponse.json({ success: true, message: 'Payment captured' })
+  }
+
+  // Email notification endpoints (queued, delivered by the outbox worker)
+  if (path === 'send-email') {
+    // Delivery happens in the outbox worker; emailLogs gets the entry once it is sent
+    const email = await enqueueEmail(db, body)
+    outsideRequest(() => startEmailWorker(db))
+    
+    return NextResponse.json(
+      { success: true, message: 'Email queued', data: { id: email.id, status: email.status } },
+      { status: 202 }
+    )
+  }
+
+  return NextResponse.json({ success: false, error: 'Endpoint not found' }, { status: 404 })
+}
+
+async function handlePostRequest(request, { params }) {
+  try {
+    const db = await connectDB()
+    const path = params.path?.join('/') || ''
+
+    // Binary chunk uploads stream straight to disk; their metadata travels in the query string
+    if (path === 'upload' && !(request.headers.get('content-type') || '').includes('application/json')) {
+      const searchParams = new URL(request.url).searchParams
+      const uploadId = searchParams.get('uploadId')
+      if (!uploadId) {
+        return NextResponse.json({ success: false, error: 'uploadId is required' }, { status: 400 })
       }
-      await db.collection('emailLogs').insertOne(emailLog)
-      
-      return NextResponse.json({ success: true, message: 'Email sent successfully' })
+      logger.debug('Receiving chunk', { uploadId, chunkIndex: searchParams.get('chunkIndex') })
+      const result = await receiveChunk(db, {
+        uploadId,
+        fileName: searchParams.get('fileName'),
+        projectId: searchParams.get('projectId'),
+        totalChunks: Number(searchParams.get('totalChunks')),
+        chunkIndex: Number(searchParams.get('chunkIndex'))
+      }, request.body)
+      if (result.completed) await collectionsChanged('audioFiles')
+      return NextResponse.json({ success: true, ...result })
     }
 
-    return NextResponse.json({ success: false, error: 'Endpoint not found' }, { status: 404 })
+    const body = await request.json()
+
+    // Retries that carry the same Idempotency-Key get the first response back
+    return await idempotent(db, request.headers.get('idempotency-key'), path, body, () => handlePost(db, path, body, uploadClient(request)))
 
   } catch (error) {
-    console.error('POST Error:', error)
-    return NextResponse.json({ success: false, error: error.message }, { status: 500 })
+    return errorResponse('POST', params, error)
   }
 }
 
-// PUT handler
-export async function PUT(request, { params }) {
+async function handlePutRequest(request, { params }) {
   try {
     const db = await connectDB()
     const path = params.path?.join('/') || ''
     const body = await request.json()
 
-    console.log('PUT request to:', path, 'with body:', body)
-
     if (path.startsWith('projects/')) {
       const projectId = path.split('/')[1]
       const updateData = { ...body, updatedAt: new Date() }
       delete updateData.id // Don't update the ID
       
       const result = await db.collection('projects').updateOne(
-        { id: projectId },
+        { id: projectId, ...NOT_DELETED },
         { $set: updateData }
       )
       
       if (result.matchedCount === 0) {
         return NextResponse.json({ success: false, error: 'Project not found' }, { status: 404 })
       }
+      await Promise.all([collectionsChanged('projects'), projectsChanged(projectId)])
       
       return NextResponse.json({ success: true, message: 'Project updated' })
     }
@@ -322,14 +681,42 @@ export async function PUT(request, { params }) {
       const updateData = { ...body, updatedAt: new Date() }
       delete updateData.id
       
-      const result = await db.collection('sessions').updateOne(
-        { id: sessionId },
-        { $set: updateData }
-      )
+      let slot = null
+      let previous = null
+      if (SLOT_FIELDS.some((field) => field in updateData)) {
+        const existing = await db.collection('sessions').findOne({ id: sessionId })
+        if (!existing) {
+          return NextResponse.json({ success: false, error: 'Session not found' }, { status: 404 })
+        }
+        slot = bookableSlot({ ...existing, ...updateData })
+        previous = bookableSlot(existing)
+        if (slot) await reserveSlot(db, sessionId, slot, previous)
+        else if (previous) await releaseSlot(db, sessionId, previous)
+        Object.assign(updateData, sessionTimes({ ...existing, ...updateData }))
+      }
+      
+      // The booking has already moved, so a failed update moves it back
+      let result
+      try {
+        result = await db.collection('sessions').updateOne(
+          { id: sessionId },
+          { $set: updateData }
+        )
+      } catch (error) {
+        if (slot || previous) {
+          await restoreSlot(db, sessionId, previous, slot).catch((restoreError) => {
+            logger.error('Could not restore session booking', { sessionId, ...errorFields(restoreError) })
+          })
+        }
+        throw error
+      }
       
       if (result.matchedCount === 0) {
+        // Deleted meanwhile: whatever was just booked belongs to nobody
+        if (slot) await releaseSessions(db, [sessionId])
         return NextResponse.json({ success: false, error: 'Session not found' }, { status: 404 })
       }
+      await collectionsChanged('sessions')
       
       return NextResponse.json({ success: true, message: 'Session updated' })
     }
@@ -337,33 +724,31 @@ export async function PUT(request, { params }) {
     return NextResponse.json({ success: false, error: 'Endpoint not found' }, { status: 404 })
 
   } catch (error) {
-    console.error('PUT Error:', error)
-    return NextResponse.json({ success: false, error: error.message }, { status: 500 })
+    return errorResponse('PUT', params, error)
   }
 }
 
-// DELETE handler
-export async function DELETE(request, { params }) {
+async function handleDeleteRequest(request, { params }) {
   try {
     const db = await connectDB()
     const path = params.path?.join('/') || ''
 
-    console.log('DELETE request to:', path)
-
     if (path.startsWith('projects/')) {
       const projectId = path.split('/')[1]
-      const result = await db.collection('projects').deleteOne({ id: projectId })
+      const job = await scheduleProjectPurge(db, projectId)
       
-      if (result.deletedCount === 0) {
+      if (!job) {
         return NextResponse.json({ success: false, error: 'Project not found' }, { status: 404 })
       }
-      
-      // Also delete related data
-      await db.collection('audioFiles').deleteMany({ projectId })
-      await db.collection('comments').deleteMany({ projectId })
-      await db.collection('messages').deleteMany({ projectId })
-      
-      return NextResponse.json({ success: true, message: 'Project deleted' })
+      await Promise.all([collectionsChanged('projects'), projectsChanged(projectId)])
+      
+      // Related audio files, comments and messages are removed in the background;
+      // progress is at GET projects/{id}/purge
+      outsideRequest(() => startPurgeWorker(db, collectionsChanged))
+      return NextResponse.json(
+        { success: true, message: 'Project deletion scheduled', data: purgeProgress(job) },
+        { status: 202 }
+      )
     }
 
     if (path.startsWith('sessions/')) {
@@ -373,20 +758,26 @@ export async function DELETE(request, { params }) {
       if (result.deletedCount === 0) {
         return NextResponse.json({ success: false, error: 'Session not found' }, { status: 404 })
       }
+      await releaseSessions(db, [sessionId])
+      await collectionsChanged('sessions')
       
       return NextResponse.json({ success: true, message: 'Session deleted' })
     }
 
     if (path.startsWith('audio-files/')) {
       const fileId = path.split('/')[1]
-      const result = await db.collection('audioFiles').deleteOne({ id: fileId })
+      const audioFile = await db.collection('audioFiles').findOneAndDelete({ id: fileId })
       
-      if (result.deletedCount === 0) {
+      if (!audioFile) {
         return NextResponse.json({ success: false, error: 'File not found' }, { status: 404 })
       }
       
+      await removeStoredFile(audioFile.storagePath)
+      await removeStoredFile(audioFile.peaks?.path)
+      
       // Delete related comments
       await db.collection('comments').deleteMany({ fileId })
+      await collectionsChanged('audioFiles', 'comments')
       
       return NextResponse.json({ success: true, message: 'File deleted' })
     }
@@ -394,7 +785,12 @@ export async function DELETE(request, { params }) {
     return NextResponse.json({ success: false, error: 'Endpoint not found' }, { status: 404 })
 
   } catch (error) {
-    console.error('DELETE Error:', error)
-    return NextResponse.json({ success: false, error: error.message }, { status: 500 })
+    return errorResponse('DELETE', params, error)
   }
-}
\ No newline at end of file
+}
+
+// Every response carries a Server-Timing breakdown of DB vs handler time
+export const GET = instrument('GET', handleGetRequest)
+export const POST = instrument('POST', handlePostRequest)
+export const PUT = instrument('PUT', handlePutRequest)
+export const DELETE = instrument('DELETE', handleDeleteRequest)
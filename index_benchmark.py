@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+StudioMate Index Benchmark
+Seeds a scratch database and compares the hot route.js lookups before and
+after the indexes declared in lib/indexes.json are created.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel, MongoClient
+
+INDEXES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib", "indexes.json")
+BATCH_SIZE = 5000
+
+def load_index_spec():
+    """Index definitions shared with connectDB() in route.js"""
+    with open(INDEXES_PATH) as fh:
+        return json.load(fh)
+
+def batched(generator, size=BATCH_SIZE):
+    batch = []
+    for doc in generator:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def seed(db, projects, children_per_project, rng):
+    """Insert projects plus audio files, comments, messages and invoices hanging off them"""
+    start = datetime(2023, 1, 1)
+    project_ids = [str(uuid.uuid4()) for _ in range(projects)]
+
+    def timestamp(i):
+        return start + timedelta(seconds=i * 37)
+
+    def project_docs():
+        for i, project_id in enumerate(project_ids):
+            yield {"id": project_id, "name": f"Project {i}", "status": "active",
+                   "createdAt": timestamp(i), "updatedAt": timestamp(i)}
+
+    def child_docs(kind):
+        for i in range(projects * children_per_project):
+            project_id = project_ids[i % projects]
+            doc = {"id": str(uuid.uuid4()), "projectId": project_id}
+            if kind == "audioFiles":
+                doc.update(name=f"stem_{i}.wav", size=rng.randint(1, 500) * 1_000_000, uploadedAt=timestamp(i))
+            elif kind == "comments":
+                doc.update(fileId=f"file-{i % (projects * 4)}", timestamp=rng.uniform(0, 600),
+                           text="Tighten the low end here.", createdAt=timestamp(i))
+            elif kind == "messages":
+                doc.update(text="Ready for the overdubs?", sender="Producer Mike", createdAt=timestamp(i))
+            else:
+                doc.update(amount=rng.randint(100, 5000), status=rng.choice(["pending", "paid", "paid", "overdue"]),
+                           paymentIntentId=f"pi_fake_{uuid.uuid4()}", createdAt=timestamp(i))
+            yield doc
+
+    db.projects.insert_many(project_docs(), ordered=False)
+    for kind in ("audioFiles", "comments", "messages", "invoices"):
+        for batch in batched(child_docs(kind)):
+            db[kind].insert_many(batch, ordered=False)
+    return project_ids
+
+def benchmark_queries(db, project_ids, rng):
+    """The lookups route.js issues on its hot paths, as (label, callable-returning-explain)"""
+    project_id = rng.choice(project_ids)
+    some_comment = db.comments.find_one({"projectId": project_id})
+    some_invoice = db.invoices.find_one()
+    return [
+        ("projects.findOne({id})",
+         lambda: db.projects.find({"id": project_id}).limit(1).explain()),
+        ("audioFiles.find({projectId}) by uploadedAt",
+         lambda: db.audioFiles.find({"projectId": project_id}).sort([("uploadedAt", ASCENDING), ("id", ASCENDING)]).limit(101).explain()),
+        ("comments.find({projectId}) by createdAt",
+         lambda: db.comments.find({"projectId": project_id}).sort([("createdAt", ASCENDING), ("id", ASCENDING)]).limit(101).explain()),
+        ("comments.find({fileId}) by timestamp",
+         lambda: db.comments.find({"fileId": some_comment["fileId"]}).sort([("timestamp", ASCENDING), ("id", ASCENDING)]).limit(101).explain()),
+        ("comments.find({fileId, timestamp window})",
+         lambda: db.comments.find({"fileId": some_comment["fileId"], "timestamp": {"$gte": 120, "$lt": 150}}).sort([("timestamp", ASCENDING), ("id", ASCENDING)]).limit(101).explain()),
+        ("messages.find({projectId}) by createdAt",
+         lambda: db.messages.find({"projectId": project_id}).sort([("createdAt", ASCENDING), ("id", ASCENDING)]).limit(101).explain()),
+        ("invoices.updateOne({paymentIntentId}) match",
+         lambda: db.invoices.find({"paymentIntentId": some_invoice["paymentIntentId"]}).limit(1).explain()),
+        ("invoices.countDocuments({status: 'paid'})",
+         lambda: db.invoices.find({"status": "paid"}, {"_id": 0, "status": 1}).explain()),
+    ]
+
+def winning_stages(plan):
+    # Slot-based engine explains (MongoDB 7+) nest the classic plan under queryPlan
+    plan = plan.get("queryPlan", plan)
+    stages = []
+    while plan:
+        stages.append(plan.get("stage"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+def measure(queries, repeat):
+    """Median server execution time and documents examined per query"""
+    results = {}
+    for label, explain in queries:
+        times, examined, stages = [], 0, []
+        for _ in range(repeat):
+            stats = explain()
+            times.append(stats["executionStats"]["executionTimeMillis"])
+            examined = stats["executionStats"]["totalDocsExamined"]
+            stages = winning_stages(stats["queryPlanner"]["winningPlan"])
+        results[label] = {"median_ms": statistics.median(times), "docs_examined": examined,
+                          "plan": "IXSCAN" if "IXSCAN" in stages else ("COLLSCAN" if "COLLSCAN" in stages else "/".join(filter(None, stages)))}
+    return results
+
+def create_indexes(db):
+    for collection, indexes in load_index_spec().items():
+        models = [IndexModel(list(index["key"].items()), **{k: v for k, v in index.items() if k != "key"}) for index in indexes]
+        db[collection].create_indexes(models)
+
+def run_index_benchmark(mongo_url, db_name, projects, children, repeat, keep):
+    print("🚀 Starting StudioMate Index Benchmark")
+    print("=" * 70)
+
+    client = MongoClient(mongo_url)
+    client.drop_database(db_name)
+    db = client[db_name]
+    rng = random.Random(42)
+
+    started = time.perf_counter()
+    project_ids = seed(db, projects, children, rng)
+    print(f"  Seeded {projects} projects x {children} children per collection in {time.perf_counter() - started:.1f}s")
+
+    queries = benchmark_queries(db, project_ids, rng)
+    before = measure(queries, repeat)
+    started = time.perf_counter()
+    create_indexes(db)
+    print(f"  Built indexes from {os.path.relpath(INDEXES_PATH)} in {time.perf_counter() - started:.1f}s")
+    after = measure(queries, repeat)
+
+    print(f"\n  {'query':<46} {'plan':>18} {'docs examined':>22} {'median ms':>16}")
+    regressions = 0
+    for label, _ in queries:
+        b, a = before[label], after[label]
+        print(f"  {label:<46} {b['plan']:>8} -> {a['plan']:<7} {b['docs_examined']:>10} -> {a['docs_examined']:<9} "
+              f"{b['median_ms']:>6} -> {a['median_ms']:<6}")
+        if a["plan"] != "IXSCAN":
+            regressions += 1
+
+    if regressions:
+        print(f"\n⚠️  {regressions} queries still scan the collection after indexing")
+    else:
+        print("\n🎉 Every hot query is served by an index")
+
+    if not keep:
+        client.drop_database(db_name)
+    client.close()
+    return before, after
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare route.js lookups with and without indexes")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="studiomate_index_bench", help="scratch database, dropped before and after")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--children", type=int, default=50, help="documents per project in each child collection")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    args = parser.parse_args()
+    run_index_benchmark(args.mongo_url, args.db_name, args.projects, args.children, args.repeat, args.keep)
@@ -0,0 +1,304 @@
+import { ApiError } from '@/lib/errors'
+import { logger } from '@/lib/logger'
+
+// Every studio has one studioCalendars document per day holding that day's
+// bookings as [start, end) minute ranges. A booking is one conditional update
+// of that document, so two overlapping requests can never both succeed.
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/
+const TIME_PATTERN = /^([01]\d|2[0-3]):([0-5]\d)$/
+export const MAX_AVAILABILITY_DAYS = 366
+const DEFAULT_OPEN = process.env.STUDIO_OPEN || '08:00'
+const DEFAULT_CLOSE = process.env.STUDIO_CLOSE || '23:00'
+const BACKFILL_BATCH_SIZE = 500
+
+export class BookingConflictError extends ApiError {
+  constructor(studio, date) {
+    super(`${studio} is already booked for part of that time on ${date}`, 409)
+  }
+}
+
+function toMinutes(value, field) {
+  const match = TIME_PATTERN.exec(value)
+  if (!match) throw new ApiError(`${field} must be HH:MM`)
+  return Number(match[1]) * 60 + Number(match[2])
+}
+
+function toTime(minutes) {
+  return `${String(Math.floor(minutes / 60)).padStart(2, '0')}:${String(minutes % 60).padStart(2, '0')}`
+}
+
+function validDate(value, field) {
+  if (!DATE_PATTERN.test(value || '') || Number.isNaN(Date.parse(`${value}T00:00:00Z`))) {
+    throw new ApiError(`${field} must be YYYY-MM-DD`)
+  }
+  return value
+}
+
+// The slot a session occupies, or null for sessions without a studio or times
+export function sessionSlot(session) {
+  const { studio, date, startTime, endTime } = session
+  if (!studio || !date || !startTime || !endTime) return null
+  const slot = {
+    studio,
+    date: validDate(date, 'date'),
+    start: toMinutes(startTime, 'startTime'),
+    end: toMinutes(endTime, 'endTime')
+  }
+  if (slot.end <= slot.start) throw new ApiError('endTime must be after startTime')
+  return slot
+}
+
+// The slot to book for a session, or null when it has none or its date and
+// times aren't the YYYY-MM-DD / HH:MM that bookings need. Such sessions are
+// still accepted, as they always were, just without a booking.
+export function bookableSlot(session) {
+  try {
+    return sessionSlot(session)
+  } catch (error) {
+    if (!(error instanceof ApiError)) throw error
+    return null
+  }
+}
+
+function sameDay(a, b) {
+  return a && b && a.studio === b.studio && a.date === b.date
+}
+
+function overlapFree({ start, end }, sessionId) {
+  return { bookings: { $not: { $elemMatch: { sessionId: { $ne: sessionId }, start: { $lt: end }, end: { $gt: start } } } } }
+}
+
+// Books `slot` for the session, or moves its existing booking there when
+// `previous` is given. Throws BookingConflictError if any other session
+// overlaps.
+export async function reserveSlot(db, sessionId, slot, previous = null) {
+  const calendars = db.collection('studioCalendars')
+  const booking = { sessionId, start: slot.start, end: slot.end }
+  const filter = { studio: slot.studio, date: slot.date, ...overlapFree(slot, sessionId) }
+
+  if (sameDay(slot, previous)) {
+    const result = await calendars.updateOne(
+      { ...filter, 'bookings.sessionId': sessionId },
+      { $set: { 'bookings.$[mine]': booking, updatedAt: new Date() } },
+      { arrayFilters: [{ 'mine.sessionId': sessionId }] }
+    )
+    if (result.matchedCount === 1) return
+    // The old booking is missing (e.g. created before bookings existed); book fresh
+  }
+
+  const update = { $push: { bookings: booking }, $set: { updatedAt: new Date() } }
+  try {
+    // No calendar yet for that day: the upsert creates it with this booking.
+    // A calendar that exists but overlaps fails the filter, so the upsert
+    // tries to insert a second document and trips the unique index.
+    await calendars.updateOne(filter, update, { upsert: true })
+  } catch (error) {
+    if (error.code !== 11000) throw error
+    // Either a real overlap, or another request created the day's calendar
+    // first; a plain conditional update tells the two apart
+    const retry = await calendars.updateOne(filter, update)
+    if (retry.matchedCount === 0) throw new BookingConflictError(slot.studio, slot.date)
+  }
+  if (previous && !sameDay(slot, previous)) {
+    await releaseSlot(db, sessionId, previous)
+  }
+}
+
+// One conditional update books every slot of a studio day at once; false
+// means at least one of them overlaps an existing booking
+async function reserveDay(db, day) {
+  const calendars = db.collection('studioCalendars')
+  const { studio, date } = day[0].slot
+  const filter = { studio, date, $and: day.map(({ sessionId, slot }) => overlapFree(slot, sessionId)) }
+  const bookings = day.map(({ sessionId, slot }) => ({ sessionId, start: slot.start, end: slot.end }))
+  const update = { $push: { bookings: { $each: bookings } }, $set: { updatedAt: new Date() } }
+  try {
+    await calendars.updateOne(filter, update, { upsert: true })
+    return true
+  } catch (error) {
+    if (error.code !== 11000) throw error
+    const retry = await calendars.updateOne(filter, update)
+    return retry.matchedCount === 1
+  }
+}
+
+// Books many new sessions ([{ sessionId, slot }]) with one update per studio
+// day, all days in parallel. A day that conflicts falls back to booking its
+// sessions one by one to find the culprits. Returns a Map of session id to
+// the reason it could not be booked; if it throws, nothing stays booked.
+export async function reserveSlots(db, requests) {
+  const refused = new Map()
+  const days = new Map()
+  for (const request of requests) {
+    const { studio, date, start, end } = request.slot
+    const key = `${studio}\u0000${date}`
+    if (!days.has(key)) days.set(key, [])
+    const day = days.get(key)
+    if (day.some(({ slot }) => slot.start < end && slot.end > start)) {
+      refused.set(request.sessionId, new BookingConflictError(studio, date).message)
+    } else {
+      day.push(request)
+    }
+  }
+
+  const reserved = []
+  const reserveOne = async ({ sessionId, slot }) => {
+    try {
+      await reserveSlot(db, sessionId, slot)
+      reserved.push(sessionId)
+    } catch (error) {
+      if (!(error instanceof ApiError)) throw error
+      refused.set(sessionId, error.message)
+    }
+  }
+  // allSettled, not all: a failure must not release while other days are
+  // still being booked
+  const outcomes = await Promise.allSettled([...days.values()].map(async (day) => {
+    if (await reserveDay(db, day)) {
+      reserved.push(...day.map(({ sessionId }) => sessionId))
+      return
+    }
+    const settled = await Promise.allSettled(day.map(reserveOne))
+    const failure = settled.find(({ status }) => status === 'rejected')
+    if (failure) throw failure.reason
+  }))
+  const failure = outcomes.find(({ status }) => status === 'rejected')
+  if (failure) {
+    await releaseSessions(db, reserved)
+    throw failure.reason
+  }
+  return refused
+}
+
+// Books the slots of sessions written before studio calendars existed, so
+// new bookings can't overlap them. Oldest first, so of two overlapping
+// sessions the earlier one keeps its slot; the other is reported, since only
+// a person can decide which to move. Sessions that already hold a booking
+// are skipped, so running it again only books what is still missing.
+export async function backfillStudioCalendars(db) {
+  const calendars = db.collection('studioCalendars')
+  const cursor = db.collection('sessions')
+    .find(
+      { studio: { $type: 'string' }, date: { $type: 'string' }, startTime: { $type: 'string' }, endTime: { $type: 'string' } },
+      { projection: { _id: 0, id: 1, studio: 1, date: 1, startTime: 1, endTime: 1 } }
+    )
+    .sort({ createdAt: 1, id: 1 })
+  let booked = 0
+  const conflicts = []
+
+  const bookBatch = async (batch) => {
+    const held = new Set()
+    const days = await calendars
+      .find({ 'bookings.sessionId': { $in: batch.map((session) => session.id) } }, { projection: { _id: 0, bookings: 1 } })
+      .toArray()
+    days.forEach((day) => day.bookings.forEach((booking) => held.add(booking.sessionId)))
+    const requests = []
+    for (const session of batch) {
+      const slot = !held.has(session.id) && bookableSlot(session)
+      if (slot) requests.push({ sessionId: session.id, slot })
+    }
+    const refused = await reserveSlots(db, requests)
+    booked += requests.length - refused.size
+    for (const { sessionId, slot } of requests) {
+      if (!refused.has(sessionId)) continue
+      conflicts.push({ sessionId, studio: slot.studio, date: slot.date, reason: refused.get(sessionId) })
+      logger.warn('Session overlaps an earlier booking', conflicts[conflicts.length - 1])
+    }
+  }
+
+  let batch = []
+  for await (const session of cursor) {
+    batch.push(session)
+    if (batch.length === BACKFILL_BATCH_SIZE) {
+      await bookBatch(batch)
+      batch = []
+    }
+  }
+  if (batch.length) await bookBatch(batch)
+  if (booked || conflicts.length) {
+    logger.info('Backfilled studio calendars', { booked, conflicts: conflicts.length })
+  }
+  return { booked, conflicts }
+}
+
+// Puts a session's booking back from `current` to `previous` after the
+// update that moved it failed. If the old slot was taken meanwhile the
+// session is left without a booking, which is logged.
+export async function restoreSlot(db, sessionId, previous, current) {
+  if (!previous) {
+    if (current) await releaseSlot(db, sessionId, current)
+    return
+  }
+  try {
+    await reserveSlot(db, sessionId, previous, current)
+  } catch (error) {
+    if (!(error instanceof BookingConflictError)) throw error
+    logger.warn('Session lost its booking after a failed update', { sessionId, studio: previous.studio, date: previous.date })
+    if (current) await releaseSlot(db, sessionId, current)
+  }
+}
+
+export async function releaseSlot(db, sessionId, slot) {
+  await db.collection('studioCalendars').updateOne(
+    { studio: slot.studio, date: slot.date },
+    { $pull: { bookings: { sessionId } }, $set: { updatedAt: new Date() } }
+  )
+}
+
+export async function releaseSessions(db, sessionIds) {
+  if (!sessionIds.length) return
+  await db.collection('studioCalendars').updateMany(
+    { 'bookings.sessionId': { $in: sessionIds } },
+    { $pull: { bookings: { sessionId: { $in: sessionIds } } }, $set: { updatedAt: new Date() } }
+  )
+}
+
+function* daysBetween(from, to) {
+  for (let day = new Date(`${from}T00:00:00Z`); day <= new Date(`${to}T00:00:00Z`); day.setUTCDate(day.getUTCDate() + 1)) {
+    yield day.toISOString().slice(0, 10)
+  }
+}
+
+// Free and booked ranges for one studio, per day, within opening hours.
+// Reads one small document per day instead of the day's sessions.
+export async function studioAvailability(db, searchParams) {
+  const studio = searchParams.get('studio')
+  if (!studio) throw new ApiError('studio is required')
+  const from = validDate(searchParams.get('from'), 'from')
+  const to = validDate(searchParams.get('to') || from, 'to')
+  if (to < from) throw new ApiError('from must not be after to')
+  if ((Date.parse(to) - Date.parse(from)) / 86400000 >= MAX_AVAILABILITY_DAYS) {
+    throw new ApiError(`At most ${MAX_AVAILABILITY_DAYS} days per request`)
+  }
+  const days = [...daysBetween(from, to)]
+  const open = toMinutes(searchParams.get('open') || DEFAULT_OPEN, 'open')
+  const close = toMinutes(searchParams.get('close') || DEFAULT_CLOSE, 'close')
+  const minMinutes = Number(searchParams.get('minMinutes') || 30)
+  if (close <= open) throw new ApiError('close must be after open')
+  if (!Number.isInteger(minMinutes) || minMinutes < 1) throw new ApiError('minMinutes must be a positive integer')
+
+  const calendars = await db.collection('studioCalendars')
+    .find({ studio, date: { $gte: from, $lte: to } }, { projection: { _id: 0, date: 1, bookings: 1 } })
+    .toArray()
+  const byDate = new Map(calendars.map((calendar) => [calendar.date, calendar.bookings]))
+
+  return days.map((date) => {
+    const bookings = [...(byDate.get(date) || [])].sort((a, b) => a.start - b.start)
+    const free = []
+    let cursor = open
+    for (const { start, end } of bookings) {
+      const gapEnd = Math.min(start, close)
+      if (gapEnd - cursor >= minMinutes) {
+        free.push({ startTime: toTime(cursor), endTime: toTime(gapEnd) })
+      }
+      cursor = Math.max(cursor, end)
+      if (cursor >= close) break
+    }
+    if (close - cursor >= minMinutes) free.push({ startTime: toTime(cursor), endTime: toTime(close) })
+    return {
+      date,
+      free,
+      booked: bookings.map(({ sessionId, start, end }) => ({ sessionId, startTime: toTime(start), endTime: toTime(end) }))
+    }
+  })
+}
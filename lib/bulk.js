@@ -0,0 +1,169 @@
+import { ApiError } from '@/lib/errors'
+import { errorFields, logger } from '@/lib/logger'
+
+export const MAX_BULK_OPERATIONS = 5000
+
+// Accepts { operations: [{ op: 'create', data } | { op: 'update', id, data } | { op: 'delete', id }] }
+// or the shorthand { items: [data, ...] } for plain creates.
+export function parseBulkBody(body) {
+  const operations = Array.isArray(body?.operations)
+    ? body.operations
+    : Array.isArray(body?.items) ? body.items.map((data) => ({ op: 'create', data })) : null
+  if (!operations || operations.length === 0) {
+    throw new ApiError('Expected a non-empty operations or items array')
+  }
+  if (operations.length > MAX_BULK_OPERATIONS) {
+    throw new ApiError(`At most ${MAX_BULK_OPERATIONS} operations per request`, 413)
+  }
+  return operations
+}
+
+// Runs every operation in one unordered bulkWrite and reports a result per
+// input index, so one bad item never fails the rest of the batch. Optional
+// hooks let an endpoint veto items and undo side effects:
+// beforeCreates(docs) runs once for all creates and returns a Map of doc id
+// to the reason it was refused; createFailed(docs) undoes it for creates that
+// were accepted but are known not to be written; beforeUpdate(id, data)
+// vetoes an update by throwing an ApiError; afterDelete(ids, docs) runs for
+// the deleted documents, with docs holding the deleteProjection fields as
+// they were read before the delete. The deletes have happened by then, so an
+// afterDelete failure is reported on their results instead of failing the
+// request.
+export async function executeBulk(collection, operations, createDocument, hooks = {}) {
+  const results = new Array(operations.length)
+  const writes = []
+  const writeIndexes = []
+
+  const targetIds = operations.filter((op) => op?.op === 'update' || op?.op === 'delete').map((op) => op.id)
+  const existing = new Map()
+  if (targetIds.length) {
+    const projection = { ...hooks.deleteProjection, _id: 0, id: 1 }
+    const found = await collection.find({ id: { $in: targetIds } }, { projection }).toArray()
+    found.forEach((doc) => existing.set(doc.id, doc))
+  }
+
+  const vetoed = async (hook, ...args) => {
+    if (!hook) return null
+    try {
+      await hook(...args)
+      return null
+    } catch (error) {
+      if (!(error instanceof ApiError)) throw error
+      return error.message
+    }
+  }
+
+  // Creates are vetoed in one batch, so per-item side effects (like booking
+  // a slot) cost one round trip per request rather than per item
+  const creates = new Map()
+  for (const [index, operation] of operations.entries()) {
+    if (operation?.op === 'create' && operation.data && typeof operation.data === 'object') {
+      creates.set(index, createDocument(operation.data))
+    }
+  }
+  const createVetoes = hooks.beforeCreates && creates.size ? await hooks.beforeCreates([...creates.values()]) : new Map()
+  const accepted = [...creates.values()].filter((doc) => !createVetoes.has(doc.id))
+
+  try {
+    for (const [index, operation] of operations.entries()) {
+      const { op, id, data } = operation || {}
+      if (op === 'create') {
+        const doc = creates.get(index)
+        if (!doc) {
+          results[index] = { index, op, success: false, error: 'create needs a data object' }
+          continue
+        }
+        if (createVetoes.has(doc.id)) {
+          results[index] = { index, op, success: false, error: createVetoes.get(doc.id) }
+          continue
+        }
+        results[index] = { index, op, success: true, id: doc.id }
+        writes.push({ insertOne: { document: doc } })
+      } else if (op === 'update' || op === 'delete') {
+        if (typeof id !== 'string' || !existing.has(id)) {
+          results[index] = { index, op, id, success: false, error: 'Not found' }
+          continue
+        }
+        if (op === 'update') {
+          if (!data || typeof data !== 'object') {
+            results[index] = { index, op, id, success: false, error: 'update needs a data object' }
+            continue
+          }
+          const veto = await vetoed(hooks.beforeUpdate, id, data)
+          if (veto) {
+            results[index] = { index, op, id, success: false, error: veto }
+            continue
+          }
+          const updateData = { ...data, updatedAt: new Date() }
+          delete updateData.id
+          delete updateData._id
+          writes.push({ updateOne: { filter: { id }, update: { $set: updateData } } })
+        } else {
+          writes.push({ deleteOne: { filter: { id } } })
+        }
+        results[index] = { index, op, id, success: true }
+      } else {
+        results[index] = { index, op, success: false, error: `Unknown op: ${op}` }
+        continue
+      }
+      writeIndexes.push(index)
+    }
+  } catch (error) {
+    // Nothing has been written yet
+    if (accepted.length && hooks.createFailed) await hooks.createFailed(accepted)
+    throw error
+  }
+
+  if (writes.length) {
+    try {
+      await collection.bulkWrite(writes, { ordered: false })
+    } catch (error) {
+      if (!error.writeErrors) {
+        await undoUnwrittenCreates(collection, accepted, hooks)
+        throw error
+      }
+      const writeErrors = Array.isArray(error.writeErrors) ? error.writeErrors : [error.writeErrors]
+      const failedCreates = []
+      for (const writeError of writeErrors) {
+        const index = writeIndexes[writeError.index]
+        results[index] = { ...results[index], success: false, error: writeError.errmsg || writeError.message }
+        const insert = writes[writeError.index].insertOne
+        if (insert) failedCreates.push(insert.document)
+      }
+      if (failedCreates.length && hooks.createFailed) await hooks.createFailed(failedCreates)
+    }
+    const deletes = results.filter((result) => result.op === 'delete' && result.success)
+    if (deletes.length && hooks.afterDelete) {
+      const deleted = deletes.map((result) => result.id)
+      try {
+        await hooks.afterDelete(deleted, deleted.map((id) => existing.get(id)))
+      } catch (error) {
+        logger.error('Bulk delete cleanup failed', { deleted: deleted.length, ...errorFields(error) })
+        for (const result of deletes) result.cleanupError = error.message
+      }
+    }
+  }
+
+  const succeeded = results.filter((result) => result.success).length
+  return {
+    results,
+    summary: { total: results.length, succeeded, failed: results.length - succeeded }
+  }
+}
+
+// An unordered bulkWrite that fails outright (e.g. the connection drops) may
+// still have inserted some documents, so only the creates that are missing
+// have their side effects undone; if even that can't be checked, nothing is.
+async function undoUnwrittenCreates(collection, accepted, hooks) {
+  if (!accepted.length || !hooks.createFailed) return
+  try {
+    const written = await collection
+      .find({ id: { $in: accepted.map((doc) => doc.id) } }, { projection: { _id: 0, id: 1 } })
+      .toArray()
+    const writtenIds = new Set(written.map((doc) => doc.id))
+    const unwritten = accepted.filter((doc) => !writtenIds.has(doc.id))
+    if (unwritten.length) await hooks.createFailed(unwritten)
+  } catch (error) {
+    logger.error('Could not undo unwritten bulk creates', { creates: accepted.length, ...errorFields(error, false) })
+  }
+}
@@ -0,0 +1,76 @@
+// Small in-process cache with a per-entry time-to-live. Values can be
+// promises, so concurrent misses for the same key share one computation.
+// With `maxEntries` it also evicts the least recently used entry when full.
+export class TtlCache {
+  constructor(ttlMs, maxEntries = Infinity) {
+    this.ttlMs = ttlMs
+    this.maxEntries = maxEntries
+    this.entries = new Map()
+    this.counters = { hits: 0, misses: 0, expirations: 0, evictions: 0, invalidations: 0 }
+  }
+
+  get(key) {
+    const entry = this.entries.get(key)
+    if (!entry) {
+      this.counters.misses++
+      return undefined
+    }
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(key)
+      this.counters.expirations++
+      this.counters.misses++
+      return undefined
+    }
+    this.counters.hits++
+    if (this.maxEntries !== Infinity) {
+      // Map iteration follows insertion order, so re-inserting marks it most recent
+      this.entries.delete(key)
+      this.entries.set(key, entry)
+    }
+    return entry.value
+  }
+
+  set(key, value, ttlMs = this.ttlMs) {
+    this.entries.delete(key)
+    this.entries.set(key, { value, expiresAt: Date.now() + ttlMs })
+    if (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value)
+      this.counters.evictions++
+    }
+    return value
+  }
+
+  delete(key) {
+    this.entries.delete(key)
+  }
+
+  // delete() on behalf of a write, counted when there was something to drop
+  invalidate(key) {
+    if (this.entries.delete(key)) this.counters.invalidations++
+  }
+
+  clear() {
+    this.entries.clear()
+  }
+
+  stats() {
+    const lookups = this.counters.hits + this.counters.misses
+    return {
+      size: this.entries.size,
+      maxEntries: this.maxEntries === Infinity ? null : this.maxEntries,
+      ...this.counters,
+      hitRate: lookups ? Math.round(this.counters.hits / lookups * 1000) / 1000 : null
+    }
+  }
+
+  // Returns [value, hit]. A rejected computation is evicted so the next call retries.
+  async getOrCompute(key, compute) {
+    const cached = this.get(key)
+    if (cached !== undefined) return [await cached, true]
+    const pending = this.set(key, Promise.resolve().then(compute))
+    pending.catch(() => {
+      if (this.entries.get(key)?.value === pending) this.entries.delete(key)
+    })
+    return [await pending, false]
+  }
+}
@@ -0,0 +1,98 @@
+import { ApiError } from '@/lib/errors'
+import { logger } from '@/lib/logger'
+
+// Sessions keep the `date`/`startTime`/`endTime` strings the UI edits, plus
+// typed `startsAt`/`endsAt` Dates for range queries. Times are studio
+// wall-clock, stored as if UTC so comparisons don't depend on the server's
+// time zone.
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/
+const TIME_PATTERN = /^([01]\d|2[0-3]):[0-5]\d$/
+const DAY_MS = 24 * 60 * 60 * 1000
+const BACKFILL_BATCH_SIZE = 1000
+
+function wallClock(date, time) {
+  if (!DATE_PATTERN.test(date || '')) return null
+  const value = new Date(`${date}T${TIME_PATTERN.test(time || '') ? time : '00:00'}:00.000Z`)
+  return Number.isNaN(value.getTime()) ? null : value
+}
+
+// The typed fields for a session, or unsets them when it has no usable date
+export function sessionTimes(session) {
+  const startsAt = wallClock(session.date, session.startTime)
+  if (!startsAt) return { startsAt: null, endsAt: null }
+  const endsAt = session.endTime ? wallClock(session.date, session.endTime) : null
+  return { startsAt, endsAt: endsAt && endsAt > startsAt ? endsAt : startsAt }
+}
+
+export function withSessionTimes(session) {
+  const { startsAt, endsAt } = sessionTimes(session)
+  return startsAt ? { ...session, startsAt, endsAt } : session
+}
+
+// `from`/`to` accept a day (YYYY-MM-DD, `to` inclusive) or an ISO instant (`to` exclusive)
+function parseBound(raw, param) {
+  if (DATE_PATTERN.test(raw)) {
+    const day = wallClock(raw)
+    if (!day) throw new ApiError(`${param} must be YYYY-MM-DD or an ISO timestamp`)
+    return param === 'to' ? new Date(day.getTime() + DAY_MS) : day
+  }
+  const value = new Date(raw)
+  if (!/^\d{4}-\d{2}-\d{2}T/.test(raw) || Number.isNaN(value.getTime())) {
+    throw new ApiError(`${param} must be YYYY-MM-DD or an ISO timestamp`)
+  }
+  return value
+}
+
+// Builds the sessions filter for the calendar parameters. Returns null when
+// none are present so plain listings keep their createdAt order.
+export function calendarQuery(searchParams) {
+  const query = {}
+  for (const field of ['studio', 'engineer']) {
+    const value = searchParams.get(field)
+    if (value) query[field] = value
+  }
+  const from = searchParams.get('from')
+  const to = searchParams.get('to')
+  if (!from && !to && !Object.keys(query).length) return null
+
+  // Undated sessions have no place on a calendar (and would break the startsAt cursor)
+  query.startsAt = { $type: 'date' }
+  if (from) query.startsAt.$gte = parseBound(from, 'from')
+  if (to) query.startsAt.$lt = parseBound(to, 'to')
+  if (from && to && query.startsAt.$gte >= query.startsAt.$lt) {
+    throw new ApiError('from must be before to')
+  }
+  return query
+}
+
+// Monday 00:00 of the current week, on the same wall-clock scale as startsAt
+export function currentWeek(now = new Date()) {
+  const today = Date.UTC(now.getFullYear(), now.getMonth(), now.getDate())
+  const start = new Date(today - ((now.getDay() + 6) % 7) * DAY_MS)
+  return { start, end: new Date(start.getTime() + 7 * DAY_MS) }
+}
+
+// Adds startsAt/endsAt to sessions written before they existed, a batch at a
+// time; onChange('sessions') lets cached reads and ETags pick them up
+export async function backfillSessionTimes(db, onChange) {
+  const sessions = db.collection('sessions')
+  let updated = 0
+  for (;;) {
+    const batch = await sessions
+      .find({ startsAt: { $exists: false }, date: { $type: 'string' } }, { projection: { _id: 0, id: 1, date: 1, startTime: 1, endTime: 1 } })
+      .limit(BACKFILL_BATCH_SIZE)
+      .toArray()
+    if (!batch.length) break
+    await sessions.bulkWrite(batch.map((session) => {
+      const { startsAt, endsAt } = sessionTimes(session)
+      // Unparseable dates get an explicit null so they aren't picked up again
+      return { updateOne: { filter: { id: session.id }, update: { $set: { startsAt, endsAt } } } }
+    }), { ordered: false })
+    updated += batch.length
+  }
+  if (updated) {
+    logger.info('Backfilled session startsAt', { updated })
+    await onChange?.('sessions')
+  }
+  return updated
+}
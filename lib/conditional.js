@@ -0,0 +1,82 @@
+import { createHash } from 'crypto'
+import { promisify } from 'util'
+import { brotliCompress, constants, gzip } from 'zlib'
+
+// List responses carry an ETag built from a version counter per collection,
+// bumped on every write. A client revalidating with If-None-Match gets a 304
+// from one small read instead of the page being fetched and serialized again.
+// Counters live in Mongo so every instance of the API agrees on them.
+const COMPRESS_MIN_BYTES = Number(process.env.COMPRESS_MIN_BYTES || 1024)
+const ENCODERS = {
+  // Low brotli quality keeps most of the size win at a fraction of the CPU
+  br: (body) => promisify(brotliCompress)(body, { params: { [constants.BROTLI_PARAM_QUALITY]: 4 } }),
+  gzip: (body) => promisify(gzip)(body, { level: 6 })
+}
+
+export async function bumpVersions(db, names) {
+  if (!names.length) return
+  await db.collection('collectionVersions').bulkWrite(names.map((name) => ({
+    updateOne: {
+      filter: { _id: name },
+      // The epoch keeps ETags from an earlier run of the counters from matching again
+      update: { $inc: { version: 1 }, $setOnInsert: { epoch: Date.now() } },
+      upsert: true
+    }
+  })), { ordered: false })
+}
+
+async function listEtag(db, names, url) {
+  const versions = await db.collection('collectionVersions').find({ _id: { $in: names } }).toArray()
+  const byName = new Map(versions.map((doc) => [doc._id, `${doc.epoch}.${doc.version}`]))
+  const state = names.map((name) => `${name}:${byName.get(name) || 0}`).join(',')
+  const { pathname, search } = new URL(url)
+  return `W/"${createHash('sha1').update(`${state}|${pathname}${search}`).digest('base64url')}"`
+}
+
+function etagMatches(header, etag) {
+  if (!header) return false
+  const opaque = etag.replace(/^W\//, '')
+  return header.split(',').some((tag) => {
+    const candidate = tag.trim()
+    return candidate === '*' || candidate.replace(/^W\//, '') === opaque
+  })
+}
+
+function pickEncoding(header) {
+  const accepted = new Map()
+  for (const part of (header || '').split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';')
+    const q = params.map((param) => param.trim()).find((param) => param.startsWith('q='))
+    if (name) accepted.set(name, q ? Number(q.slice(2)) : 1)
+  }
+  return Object.keys(ENCODERS).find((encoding) =>
+    accepted.has(encoding) ? accepted.get(encoding) > 0 : accepted.get('*') > 0
+  ) || null
+}
+
+// Serializes `payload` and compresses it when the client accepts br or gzip
+// and the body is big enough to be worth it
+export async function encodedJson(request, payload, { status = 200, headers = {} } = {}) {
+  let body = Buffer.from(JSON.stringify(payload))
+  const responseHeaders = { 'Content-Type': 'application/json', Vary: 'Accept-Encoding', ...headers }
+  const encoding = body.length >= COMPRESS_MIN_BYTES && pickEncoding(request.headers.get('accept-encoding'))
+  if (encoding) {
+    body = await ENCODERS[encoding](body)
+    responseHeaders['Content-Encoding'] = encoding
+  }
+  responseHeaders['Content-Length'] = String(body.length)
+  return new Response(body, { status, headers: responseHeaders })
+}
+
+// Answers a GET over `collections` with 304 when the client's ETag is still
+// current, otherwise builds the payload and sends it with the new ETag. The
+// version is read before the data so a write racing the read can only make
+// the ETag older than the body, never newer.
+export async function conditionalJson(request, db, collections, build) {
+  const etag = await listEtag(db, collections, request.url)
+  const headers = { ETag: etag, 'Cache-Control': 'private, no-cache', Vary: 'Accept-Encoding' }
+  if (etagMatches(request.headers.get('if-none-match'), etag)) {
+    return new Response(null, { status: 304, headers })
+  }
+  return encodedJson(request, await build(), { headers })
+}
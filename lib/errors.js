@@ -0,0 +1,7 @@
+// Errors that should reach the client with their own HTTP status instead of a 500
+export class ApiError extends Error {
+  constructor(message, status = 400) {
+    super(message)
+    this.status = status
+  }
+}
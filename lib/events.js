@@ -0,0 +1,132 @@
+import { EventEmitter } from 'events'
+import { errorFields, logger } from '@/lib/logger'
+
+// Fan-out hub for server-sent events within this process. Each published
+// event is encoded once and the same bytes are queued to every listener.
+const hub = new EventEmitter()
+hub.setMaxListeners(0)
+
+const encoder = new TextEncoder()
+const HEARTBEAT_MS = Number(process.env.SSE_HEARTBEAT_MS || 15000)
+// A listener with this many bytes queued and unread is cut loose; it reconnects
+// with Last-Event-ID and catches up from the database instead.
+const MAX_QUEUED_BYTES = Number(process.env.SSE_MAX_QUEUED_BYTES || 1024 * 1024)
+const RETRY_MS = 3000
+// Clients sent away to catch up come back sooner
+const RESUME_RETRY_MS = 500
+
+export function sseFrame({ id, event, data }) {
+  let frame = ''
+  if (id) frame += `id: ${id}\n`
+  if (event) frame += `event: ${event}\n`
+  frame += `data: ${JSON.stringify(data)}\n\n`
+  return encoder.encode(frame)
+}
+
+export function publish(channel, event) {
+  if (hub.listenerCount(channel) === 0) return
+  hub.emit(channel, sseFrame(event), event.id)
+}
+
+export function listenerCount(channel) {
+  return hub.listenerCount(channel)
+}
+
+// Opens an SSE response on `channel`. `replay` runs after the subscription
+// is in place and yields the events the client missed (any iterable, async
+// ones included, so a long backlog can be read a page at a time), so nothing
+// published while it runs is lost; live events it already covered are
+// skipped by id. The backlog is only read as fast as the client takes it, so
+// a slow client still gets through it; the live events held back meanwhile
+// are capped, and past the cap the client is sent away to resume from the
+// last replayed id. A live client too slow to keep up is cut loose the same way.
+export function eventStream(channel, { signal, replay } = {}) {
+  let cleanup = () => {}
+  let drained = () => {}
+  const stream = new ReadableStream({
+    start(controller) {
+      let closed = false
+      let pending = []
+      let pendingBytes = 0
+      const delivered = new Set()
+
+      const cutLoose = () => {
+        cleanup()
+        controller.enqueue(encoder.encode(`retry: ${RESUME_RETRY_MS}\n\n`))
+        controller.close()
+      }
+      const send = (frame) => {
+        if (closed) return
+        if (controller.desiredSize !== null && controller.desiredSize <= 0) return cutLoose()
+        controller.enqueue(frame)
+      }
+      const onEvent = (frame, id) => {
+        if (!pending) {
+          if (!delivered.has(id)) send(frame)
+          return
+        }
+        pending.push([frame, id])
+        pendingBytes += frame.byteLength
+        if (pendingBytes > MAX_QUEUED_BYTES) cutLoose()
+      }
+      const heartbeat = setInterval(() => send(encoder.encode(': ping\n\n')), HEARTBEAT_MS)
+      heartbeat.unref?.()
+
+      cleanup = () => {
+        if (closed) return
+        closed = true
+        clearInterval(heartbeat)
+        hub.off(channel, onEvent)
+        signal?.removeEventListener('abort', onAbort)
+        drained()
+      }
+      const onAbort = () => {
+        cleanup()
+        try { controller.close() } catch {}
+      }
+      if (signal?.aborted) return onAbort()
+      signal?.addEventListener('abort', onAbort)
+      hub.on(channel, onEvent)
+
+      controller.enqueue(encoder.encode(`retry: ${RETRY_MS}\n\n`))
+      // Not awaited: pull() only runs once start() has returned
+      catchUp()
+
+      async function room() {
+        while (!closed && controller.desiredSize <= 0) {
+          await new Promise((resolve) => { drained = resolve })
+        }
+      }
+
+      async function catchUp() {
+        try {
+          for await (const event of (replay ? await replay() : [])) {
+            await room()
+            if (closed) return
+            delivered.add(event.id)
+            controller.enqueue(sseFrame(event))
+          }
+        } catch (error) {
+          logger.error('SSE replay failed', { channel, ...errorFields(error) })
+        }
+        await room()
+        if (closed) return
+        // The held-back events are capped, so they go out in one go
+        for (const [frame, id] of pending) {
+          if (!delivered.has(id)) controller.enqueue(frame)
+        }
+        pending = null
+        // The replay ids only matter for events that raced it
+        delivered.clear()
+        controller.enqueue(sseFrame({ event: 'ready', data: { channel } }))
+      }
+    },
+    pull() {
+      drained()
+    },
+    cancel() {
+      cleanup()
+    }
+  }, { highWaterMark: MAX_QUEUED_BYTES, size: (chunk) => chunk.byteLength })
+  return stream
+}
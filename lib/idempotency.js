@@ -0,0 +1,115 @@
+import { createHash } from 'crypto'
+import { TtlCache } from '@/lib/cache'
+import { ApiError } from '@/lib/errors'
+
+// A POST carrying an Idempotency-Key runs once; repeats of the same key get
+// the stored response back instead of writing again. Finished responses live
+// in idempotencyKeys (expired by a TTL index) with a bounded LRU in front, so
+// retries hitting this process don't reach Mongo at all.
+const TTL_MS = Number(process.env.IDEMPOTENCY_TTL_MS || 24 * 60 * 60 * 1000)
+const CACHE_SIZE = Number(process.env.IDEMPOTENCY_CACHE_SIZE || 10000)
+// How long a request may hold a key before another process may take it over
+const LOCK_MS = Number(process.env.IDEMPOTENCY_LOCK_MS || 30000)
+const MAX_KEY_LENGTH = 255
+
+const recent = new TtlCache(TTL_MS, CACHE_SIZE)
+
+function fingerprint(path, body) {
+  return createHash('sha256').update(`${path}\n${JSON.stringify(body)}`).digest('hex')
+}
+
+function sameRequest(record, expected) {
+  if (record.fingerprint !== expected) {
+    throw new ApiError('Idempotency-Key was already used for a different request', 422)
+  }
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+// Runs the handler while holding the key, then stores what it returned.
+// Server errors release the key so the client's retry runs for real.
+async function runHolding(keys, key, hash, handler) {
+  let response
+  try {
+    response = await handler()
+  } catch (error) {
+    await keys.deleteOne({ key, state: 'pending' })
+    throw error
+  }
+  const record = {
+    fingerprint: hash,
+    status: response.status,
+    contentType: response.headers.get('content-type'),
+    body: await response.text()
+  }
+  if (record.status >= 500) {
+    await keys.deleteOne({ key, state: 'pending' })
+  } else {
+    await keys.updateOne(
+      { key },
+      { $set: { state: 'complete', response: record, expiresAt: new Date(Date.now() + TTL_MS) }, $unset: { lockedUntil: '' } }
+    )
+  }
+  return { ...record, replayed: false }
+}
+
+async function claimOrWait(keys, key, hash, handler) {
+  const deadline = Date.now() + LOCK_MS
+  for (let delay = 10; ; delay = Math.min(delay * 2, 250)) {
+    const now = new Date()
+    try {
+      await keys.insertOne({
+        key,
+        fingerprint: hash,
+        state: 'pending',
+        lockedUntil: new Date(now.getTime() + LOCK_MS),
+        createdAt: now,
+        expiresAt: new Date(now.getTime() + TTL_MS)
+      })
+      return runHolding(keys, key, hash, handler)
+    } catch (error) {
+      if (error.code !== 11000) throw error
+    }
+
+    // A key that is gone again was released by a failed holder; it is retried
+    // after the same backoff, so racing claimants don't spin on insert/find
+    const existing = await keys.findOne({ key }, { projection: { _id: 0 } })
+    if (existing) {
+      sameRequest(existing, hash)
+      if (existing.state === 'complete') {
+        return { ...existing.response, replayed: true }
+      }
+      // The holder died without finishing; whoever moves the lock first reruns it
+      if (existing.lockedUntil < now) {
+        const takeover = await keys.updateOne(
+          { key, state: 'pending', lockedUntil: existing.lockedUntil },
+          { $set: { lockedUntil: new Date(now.getTime() + LOCK_MS) } }
+        )
+        if (takeover.matchedCount === 1) return runHolding(keys, key, hash, handler)
+      }
+    }
+    if (Date.now() > deadline) {
+      throw new ApiError('A request with this Idempotency-Key is still in progress', 409)
+    }
+    await sleep(delay)
+  }
+}
+
+// Wraps a POST handler. Without a key the handler just runs.
+export async function idempotent(db, key, path, body, handler) {
+  if (key === null) return handler()
+  if (!key || key.length > MAX_KEY_LENGTH) {
+    throw new ApiError(`Idempotency-Key must be 1-${MAX_KEY_LENGTH} characters`)
+  }
+  const hash = fingerprint(path, body)
+  const cacheKey = `${path}\n${key}`
+  // Concurrent repeats in this process share the first request's promise
+  const [record, hit] = await recent.getOrCompute(cacheKey, () => claimOrWait(db.collection('idempotencyKeys'), cacheKey, hash, handler))
+  if (record.status >= 500) recent.delete(cacheKey)
+  sameRequest(record, hash)
+
+  const headers = { 'Idempotency-Key': key }
+  if (record.contentType) headers['Content-Type'] = record.contentType
+  if (hit || record.replayed) headers['Idempotent-Replayed'] = 'true'
+  return new Response(record.body, { status: record.status, headers })
+}
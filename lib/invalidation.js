@@ -0,0 +1,99 @@
+import { EventEmitter } from 'events'
+import { v4 as uuidv4 } from 'uuid'
+import { errorFields, logger } from '@/lib/logger'
+
+// Carries cache invalidations ({ cache, keys }) between API instances. A bus
+// has publish(message) and subscribe(handler). Handlers see this instance's
+// own messages synchronously inside publish, so the local cache has dropped
+// the entry before the write's response goes out; other instances catch up
+// as fast as the transport allows, and the cache TTL bounds anything lost.
+// A message without a cache means "drop every cache".
+// CACHE_INVALIDATION_BUS picks the transport: 'local' (single process, the
+// default) or 'mongo'.
+const COLLECTION = 'cacheInvalidations'
+const CAPPED_BYTES = 16 * 1024 * 1024
+const RETRY_MS = 1000
+
+export class LocalBus {
+  constructor() {
+    this.emitter = new EventEmitter()
+    this.emitter.setMaxListeners(0)
+  }
+
+  async publish(message) {
+    this.emitter.emit('message', message)
+  }
+
+  subscribe(handler) {
+    this.emitter.on('message', handler)
+    return () => this.emitter.off('message', handler)
+  }
+}
+
+// Every instance appends to a capped collection and tails it. Capped
+// collections and tailable cursors work on a standalone mongod, unlike
+// change streams, which need a replica set.
+export class MongoBus extends LocalBus {
+  constructor(db) {
+    super()
+    this.collection = db.collection(COLLECTION)
+    this.origin = uuidv4()
+    this.ready = this.start(db).catch((error) => {
+      logger.error('Cache invalidation bus failed to start', errorFields(error))
+    })
+  }
+
+  async publish(message) {
+    await super.publish(message)
+    try {
+      await this.collection.insertOne({ ...message, origin: this.origin, at: new Date() })
+    } catch (error) {
+      // The write itself succeeded; other instances fall back to the TTL
+      logger.error('Cache invalidation not broadcast', { cache: message.cache, ...errorFields(error, false) })
+    }
+  }
+
+  async start(db) {
+    try {
+      await db.createCollection(COLLECTION, { capped: true, size: CAPPED_BYTES })
+    } catch (error) {
+      if (error.codeName !== 'NamespaceExists') throw error
+    }
+    this.tail()
+  }
+
+  // Natural order is insertion order, so everything after our own marker is
+  // new. The marker also keeps the cursor alive on an empty collection.
+  async tail() {
+    for (;;) {
+      let cursor
+      try {
+        const { insertedId: marker } = await this.collection.insertOne({ origin: this.origin, at: new Date() })
+        cursor = this.collection.find({}, { tailable: true, awaitData: true })
+        let live = false
+        for await (const doc of cursor) {
+          if (!live) live = doc._id.equals(marker)
+          else if (doc.origin !== this.origin && doc.cache) {
+            this.emitter.emit('message', { cache: doc.cache, keys: doc.keys })
+          }
+        }
+      } catch (error) {
+        logger.warn('Cache invalidation tail interrupted', errorFields(error, false))
+      } finally {
+        await cursor?.close().catch(() => {})
+      }
+      // Messages published while no cursor was open are lost, so drop everything
+      this.emitter.emit('message', { cache: null, keys: null })
+      await new Promise((resolve) => setTimeout(resolve, RETRY_MS))
+    }
+  }
+}
+
+export function createInvalidationBus(db) {
+  const transport = process.env.CACHE_INVALIDATION_BUS || 'local'
+  if (transport === 'mongo') return new MongoBus(db)
+  if (transport !== 'local') {
+    logger.warn('Unknown CACHE_INVALIDATION_BUS, using local', { transport })
+  }
+  return new LocalBus()
+}
@@ -0,0 +1,40 @@
+// JSON-lines logger. Lines below LOG_LEVEL cost one comparison; the rest are
+// buffered and written to stdout once per tick, so a burst of requests is one
+// write instead of one synchronous write per line. Per-request lines are
+// sampled; failed and slow requests are always written.
+const LEVELS = { debug: 10, info: 20, warn: 30, error: 40, silent: 100 }
+const THRESHOLD = LEVELS[process.env.LOG_LEVEL] ?? LEVELS.info
+const REQUEST_SAMPLE_RATE = Number(process.env.LOG_REQUEST_SAMPLE_RATE ?? 0.01)
+const SLOW_REQUEST_MS = Number(process.env.LOG_SLOW_REQUEST_MS || 1000)
+
+let pending = []
+
+function flush() {
+  const lines = pending.join('')
+  pending = []
+  process.stdout.write(lines)
+}
+
+function write(level, msg, fields) {
+  if (LEVELS[level] < THRESHOLD) return
+  if (pending.length === 0) setImmediate(flush)
+  pending.push(`${JSON.stringify({ time: new Date().toISOString(), level, msg, ...fields })}\n`)
+}
+
+export const logger = {
+  debug: (msg, fields) => write('debug', msg, fields),
+  info: (msg, fields) => write('info', msg, fields),
+  warn: (msg, fields) => write('warn', msg, fields),
+  error: (msg, fields) => write('error', msg, fields),
+  enabled: (level) => LEVELS[level] >= THRESHOLD,
+
+  request(fields) {
+    if (fields.status >= 500 || fields.ms >= SLOW_REQUEST_MS) write('warn', 'request', fields)
+    else if (Math.random() < REQUEST_SAMPLE_RATE) write('info', 'request', fields)
+  }
+}
+
+// Error fields for a log line; the stack only for unexpected errors
+export function errorFields(error, withStack = true) {
+  return withStack ? { error: error.message, stack: error.stack } : { error: error.message }
+}
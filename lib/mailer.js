@@ -0,0 +1,406 @@
+import net from 'net'
+import os from 'os'
+import tls from 'tls'
+import { v4 as uuidv4 } from 'uuid'
+import { ApiError } from '@/lib/errors'
+import { errorFields, logger } from '@/lib/logger'
+
+// POST send-email only writes to emailOutbox; this worker delivers the
+// queued messages in batches, a few at a time, retrying with backoff and
+// dead-lettering what keeps failing.
+const BATCH_SIZE = Number(process.env.EMAIL_BATCH_SIZE || 50)
+const CONCURRENCY = Number(process.env.EMAIL_CONCURRENCY || 4)
+const MAX_ATTEMPTS = Number(process.env.EMAIL_MAX_ATTEMPTS || 5)
+const BACKOFF_BASE_MS = Number(process.env.EMAIL_BACKOFF_BASE_MS || 2000)
+const BACKOFF_MAX_MS = Number(process.env.EMAIL_BACKOFF_MAX_MS || 10 * 60 * 1000)
+const LEASE_MS = Number(process.env.EMAIL_LEASE_MS || 60000)
+const EMAIL_FROM = process.env.EMAIL_FROM || 'StudioMate <no-reply@studiomate.app>'
+
+export class DeliveryError extends Error {
+  constructor(message, permanent = false) {
+    super(message)
+    this.permanent = permanent
+  }
+}
+
+// Bare addresses only (no display names or comments): a dot-atom local part
+// and a hostname, so nothing in them can break out of RCPT TO or a header
+const ADDRESS_RE = /^[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*@[A-Za-z0-9]([A-Za-z0-9-]*[A-Za-z0-9])?(\.[A-Za-z0-9]([A-Za-z0-9-]*[A-Za-z0-9])?)+$/
+const MAX_ADDRESS_LENGTH = 254
+const MAX_SUBJECT_LENGTH = 998
+const LINE_BREAK_RE = /[\r\n\0]/
+
+function validAddress(value) {
+  return typeof value === 'string' && value.length <= MAX_ADDRESS_LENGTH && ADDRESS_RE.test(value)
+}
+
+export async function enqueueEmail(db, { to, subject, type, data }) {
+  const recipients = (Array.isArray(to) ? to : [to]).filter(Boolean)
+  if (recipients.length === 0 || !recipients.every(validAddress)) {
+    throw new ApiError('to must be an email address or a list of them')
+  }
+  if (typeof subject !== 'string' || !subject.trim()) throw new ApiError('subject is required')
+  if (subject.length > MAX_SUBJECT_LENGTH || LINE_BREAK_RE.test(subject)) {
+    throw new ApiError(`subject must be a single line of at most ${MAX_SUBJECT_LENGTH} characters`)
+  }
+  if (type !== undefined && (typeof type !== 'string' || !/^[\w.-]{1,64}$/.test(type))) {
+    throw new ApiError('type must be a short identifier')
+  }
+  const now = new Date()
+  const email = {
+    id: uuidv4(),
+    to: recipients,
+    subject,
+    type,
+    data,
+    status: 'pending',
+    attempts: 0,
+    nextAttemptAt: now,
+    createdAt: now
+  }
+  await db.collection('emailOutbox').insertOne(email)
+  return email
+}
+
+function address(value) {
+  const match = /<([^>]+)>/.exec(value)
+  return singleLine(match ? match[1] : value)
+}
+
+// Last line of defence for anything that goes into a header or an SMTP
+// command, e.g. outbox entries queued before enqueue validated them
+function singleLine(value) {
+  const text = String(value)
+  if (LINE_BREAK_RE.test(text)) throw new DeliveryError('Line break in an email header or address', true)
+  return text
+}
+
+function renderValue(value) {
+  return value !== null && typeof value === 'object' ? JSON.stringify(value) : value
+}
+
+function renderText(email) {
+  const lines = Object.entries(email.data || {}).map(([key, value]) => `${key}: ${renderValue(value)}`)
+  return [email.subject, '', ...lines].join('\r\n')
+}
+
+// RFC 2047: header text that isn't plain ASCII goes out as base64
+// encoded-words, split on character boundaries so each stays within 75
+// characters, one per folded line
+function encodeHeader(value) {
+  if (/^[\x20-\x7e]*$/.test(value)) return value
+  const words = []
+  let word = ''
+  for (const char of value) {
+    if (Buffer.byteLength(word + char) > 45) {
+      words.push(word)
+      word = ''
+    }
+    word += char
+  }
+  if (word) words.push(word)
+  return words.map((text) => `=?UTF-8?B?${Buffer.from(text).toString('base64')}?=`).join('\r\n ')
+}
+
+function renderMime(email) {
+  const headers = [
+    `From: ${singleLine(EMAIL_FROM)}`,
+    `To: ${email.to.map(address).join(', ')}`,
+    `Subject: ${encodeHeader(singleLine(email.subject))}`,
+    `Date: ${new Date().toUTCString()}`,
+    `Message-ID: <${email.id}@${os.hostname()}>`,
+    `X-StudioMate-Type: ${singleLine(email.type || 'notification')}`,
+    'MIME-Version: 1.0',
+    'Content-Type: text/plain; charset=utf-8'
+  ]
+  // Dot-stuffing: a line starting with '.' would otherwise end the DATA section
+  return `${headers.join('\r\n')}\r\n\r\n${renderText(email)}`.replace(/\r?\n/g, '\r\n').replace(/^\./gm, '..')
+}
+
+// Minimal SMTP client for a relay or local sink: EHLO, optional AUTH PLAIN,
+// then any number of MAIL/RCPT/DATA transactions on one connection.
+class SmtpConnection {
+  constructor(socket) {
+    this.socket = socket
+    this.buffer = ''
+    this.lines = []
+    this.replies = []
+    this.waiting = []
+    this.failure = null
+    socket.setEncoding('utf8')
+    socket.on('data', (chunk) => this.receive(chunk))
+    socket.on('error', (error) => this.fail(error))
+    socket.on('close', () => this.fail(new DeliveryError('SMTP connection closed')))
+  }
+
+  static async open() {
+    const host = process.env.SMTP_HOST || '127.0.0.1'
+    const port = Number(process.env.SMTP_PORT || 25)
+    const secure = process.env.SMTP_SECURE === 'true'
+    const socket = secure ? tls.connect({ host, port, servername: host }) : net.connect({ host, port })
+    socket.setTimeout(30000, () => socket.destroy(new DeliveryError('SMTP timeout')))
+    const connection = new SmtpConnection(socket)
+    await connection.expect(null, [220])
+    await connection.expect(`EHLO ${os.hostname()}`, [250])
+    if (process.env.SMTP_USER) {
+      const credentials = Buffer.from(`\0${process.env.SMTP_USER}\0${process.env.SMTP_PASSWORD || ''}`).toString('base64')
+      await connection.expect(`AUTH PLAIN ${credentials}`, [235])
+    }
+    return connection
+  }
+
+  receive(chunk) {
+    this.buffer += chunk
+    let newline
+    while ((newline = this.buffer.indexOf('\r\n')) >= 0) {
+      const line = this.buffer.slice(0, newline)
+      this.buffer = this.buffer.slice(newline + 2)
+      this.lines.push(line)
+      // "250-..." continues a multi-line reply, "250 ..." ends it
+      if (/^\d{3}(?: |$)/.test(line)) {
+        const reply = { code: Number(line.slice(0, 3)), text: this.lines.join('\n') }
+        this.lines = []
+        const next = this.waiting.shift()
+        if (next) next.resolve(reply)
+        else this.replies.push(reply)
+      }
+    }
+  }
+
+  fail(error) {
+    this.failure = this.failure || error
+    for (const { reject } of this.waiting.splice(0)) reject(this.failure)
+  }
+
+  reply() {
+    if (this.replies.length) return Promise.resolve(this.replies.shift())
+    if (this.failure) return Promise.reject(this.failure)
+    return new Promise((resolve, reject) => this.waiting.push({ resolve, reject }))
+  }
+
+  async expect(command, codes) {
+    if (command !== null) this.socket.write(`${command}\r\n`)
+    const reply = await this.reply()
+    if (!codes.includes(reply.code)) {
+      throw new DeliveryError(`SMTP ${command?.split(' ')[0] || 'greeting'}: ${reply.text}`, reply.code >= 500)
+    }
+    return reply
+  }
+
+  async send(email) {
+    // Rendered before the first command, so a bad value never starts a transaction
+    const message = renderMime(email)
+    const recipients = email.to.map(address)
+    try {
+      await this.expect(`MAIL FROM:<${address(EMAIL_FROM)}>`, [250])
+      for (const recipient of recipients) {
+        await this.expect(`RCPT TO:<${recipient}>`, [250, 251])
+      }
+      await this.expect('DATA', [354])
+      await this.expect(`${message}\r\n.`, [250])
+    } catch (error) {
+      // Leave the connection ready for the next message
+      if (!this.failure) await this.expect('RSET', [250]).catch(() => {})
+      throw error
+    }
+  }
+
+  get usable() {
+    return !this.failure
+  }
+
+  async close() {
+    if (!this.failure) await this.expect('QUIT', [221]).catch(() => {})
+    this.socket.destroy()
+  }
+}
+
+async function sendWithSendgrid(email) {
+  const response = await fetch('https://api.sendgrid.com/v3/mail/send', {
+    method: 'POST',
+    headers: { Authorization: `Bearer ${process.env.SENDGRID_API_KEY}`, 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      personalizations: [{ to: email.to.map((recipient) => ({ email: address(recipient) })) }],
+      from: { email: address(EMAIL_FROM) },
+      subject: email.subject,
+      content: [{ type: 'text/plain', value: renderText(email) }]
+    })
+  })
+  if (!response.ok) {
+    const permanent = response.status >= 400 && response.status < 500 && response.status !== 429
+    throw new DeliveryError(`SendGrid ${response.status}: ${await response.text()}`, permanent)
+  }
+}
+
+// One lane of the worker: a reusable SMTP connection, or a stateless sender
+function openLane() {
+  const transport = process.env.EMAIL_TRANSPORT || 'log'
+  if (transport === 'smtp') {
+    let connection = null
+    return {
+      async send(email) {
+        if (!connection || !connection.usable) {
+          await connection?.close()
+          connection = await SmtpConnection.open()
+        }
+        await connection.send(email)
+      },
+      close: () => connection?.close()
+    }
+  }
+  if (transport === 'sendgrid') {
+    return { send: sendWithSendgrid, close: async () => {} }
+  }
+  return {
+    async send(email) {
+      logger.info('Fake email sent', { to: email.to, subject: email.subject, type: email.type })
+    },
+    close: async () => {}
+  }
+}
+
+function backoff(attempts) {
+  const delay = Math.min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * 2 ** (attempts - 1))
+  return delay / 2 + Math.random() * delay / 2
+}
+
+function claimable(now) {
+  return {
+    $or: [
+      { status: 'pending', nextAttemptAt: { $lte: now } },
+      // A worker that died mid-batch leaves 'sending' messages behind
+      { status: 'sending', leaseUntil: { $lt: now } }
+    ]
+  }
+}
+
+async function claimBatch(outbox) {
+  const now = new Date()
+  const due = await outbox.find(claimable(now), { projection: { _id: 0, id: 1 } })
+    .sort({ nextAttemptAt: 1 })
+    .limit(BATCH_SIZE)
+    .toArray()
+  if (!due.length) return []
+  const claim = uuidv4()
+  await outbox.updateMany(
+    { id: { $in: due.map((email) => email.id) }, ...claimable(now) },
+    { $set: { status: 'sending', claim, leaseUntil: new Date(now.getTime() + LEASE_MS) } }
+  )
+  return outbox.find({ claim }, { projection: { _id: 0 } }).toArray()
+}
+
+function outcome(email, error, now) {
+  const attempts = email.attempts + 1
+  let $set
+  if (!error) {
+    $set = { status: 'sent', sentAt: now, attempts }
+  } else if (error.permanent || attempts >= MAX_ATTEMPTS) {
+    $set = { status: 'dead', deadAt: now, attempts, lastError: error.message }
+  } else {
+    $set = { status: 'pending', attempts, lastError: error.message, nextAttemptAt: new Date(now.getTime() + backoff(attempts)) }
+  }
+  return { $set, $unset: { claim: '', leaseUntil: '' } }
+}
+
+// Each message's lease is renewed right before it is sent and its outcome
+// recorded right after, both only while this claim still holds it. So however
+// long the batch runs, no message is sent once another instance could have
+// claimed it, and a message that was re-claimed is left to that instance.
+async function deliverBatch(db, batch) {
+  const outbox = db.collection('emailOutbox')
+  const sent = []
+  let failed = 0
+  let lost = 0
+  let next = 0
+  await Promise.all(Array.from({ length: Math.min(CONCURRENCY, batch.length) }, async () => {
+    const lane = openLane()
+    try {
+      while (next < batch.length) {
+        const email = batch[next++]
+        const mine = { id: email.id, claim: email.claim }
+        const renewed = await outbox.updateOne(mine, { $set: { leaseUntil: new Date(Date.now() + LEASE_MS) } })
+        if (renewed.matchedCount === 0) {
+          lost++
+          continue
+        }
+        let error = null
+        try {
+          await lane.send(email)
+        } catch (sendError) {
+          error = sendError instanceof DeliveryError ? sendError : new DeliveryError(sendError.message)
+        }
+        const recorded = await outbox.updateOne(mine, outcome(email, error, new Date()))
+        if (recorded.matchedCount === 0) lost++
+        else if (error) failed++
+        else sent.push(email)
+      }
+    } finally {
+      await lane.close()
+    }
+  }))
+
+  const now = new Date()
+  if (sent.length) {
+    await db.collection('emailLogs').insertMany(sent.map((email) => ({
+      id: uuidv4(),
+      emailId: email.id,
+      to: email.to,
+      subject: email.subject,
+      type: email.type,
+      data: email.data,
+      sentAt: now,
+      status: 'sent'
+    })))
+  }
+  return { sent: sent.length, failed, lost }
+}
+
+let draining = null
+let rerun = false
+let wakeTimer = null
+
+// Drains the outbox until nothing is due, then sleeps until the next retry
+// is due. Called on every enqueue and on connect.
+export function startEmailWorker(db) {
+  if (draining) {
+    rerun = true
+    return draining
+  }
+  draining = (async () => {
+    const outbox = db.collection('emailOutbox')
+    do {
+      rerun = false
+      let batch
+      while ((batch = await claimBatch(outbox)).length) {
+        const { sent, failed, lost } = await deliverBatch(db, batch)
+        logger.info('Email batch delivered', { sent, failed, lost })
+      }
+    } while (rerun)
+
+    const [retry, stalled] = await Promise.all([
+      outbox.find({ status: 'pending' }, { projection: { _id: 0, nextAttemptAt: 1 } }).sort({ nextAttemptAt: 1 }).limit(1).toArray(),
+      outbox.find({ status: 'sending' }, { projection: { _id: 0, leaseUntil: 1 } }).sort({ leaseUntil: 1 }).limit(1).toArray()
+    ])
+    const wakeAt = [retry[0]?.nextAttemptAt, stalled[0]?.leaseUntil].filter(Boolean).sort((a, b) => a - b)[0]
+    if (wakeAt) {
+      clearTimeout(wakeTimer)
+      wakeTimer = setTimeout(() => startEmailWorker(db), Math.max(0, wakeAt.getTime() - Date.now()) + 50)
+      wakeTimer.unref?.()
+    }
+  })().catch((error) => {
+    logger.error('Email worker failed', errorFields(error))
+    clearTimeout(wakeTimer)
+    wakeTimer = setTimeout(() => startEmailWorker(db), BACKOFF_BASE_MS)
+    wakeTimer.unref?.()
+  }).finally(() => {
+    draining = null
+  })
+  return draining
+}
+
+export async function emailStatus(db, id) {
+  return db.collection('emailOutbox').findOne(
+    { id },
+    { projection: { _id: 0, id: 1, to: 1, subject: 1, status: 1, attempts: 1, lastError: 1, createdAt: 1, sentAt: 1, deadAt: 1 } }
+  )
+}
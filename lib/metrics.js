@@ -0,0 +1,134 @@
+import crypto from 'crypto'
+import { monitorEventLoopDelay } from 'perf_hooks'
+import v8 from 'v8'
+
+// Process and Mongo pool health for GET /metrics. Reading never resets
+// anything: event-loop lag and the pool peaks cover the time since start and
+// the pool counters are cumulative, so pollers diff them. A poller that wants
+// lag and peaks for its own polling interval names a window (?window=), which
+// is measured separately and reset only by that poller's reads.
+const LOOP_RESOLUTION_MS = 10
+const MAX_WINDOWS = 8
+const METRICS_TOKEN = process.env.METRICS_TOKEN || ''
+const loopDelay = monitorEventLoopDelay({ resolution: LOOP_RESOLUTION_MS })
+loopDelay.enable()
+const started = Date.now()
+const windows = new Map()
+
+const pool = {
+  maxPoolSize: null,
+  open: 0,
+  checkedOut: 0,
+  pending: 0,
+  peakCheckedOut: 0,
+  peakPending: 0,
+  checkouts: 0,
+  checkoutFailures: 0,
+  cleared: 0
+}
+
+// Counts connection pool events (emitted without any client option)
+export function watchPool(client) {
+  pool.maxPoolSize = client.options.maxPoolSize
+  client.on('connectionCreated', () => { pool.open++ })
+  client.on('connectionClosed', () => { pool.open-- })
+  client.on('connectionCheckOutStarted', () => {
+    pool.pending++
+    notePeaks()
+  })
+  client.on('connectionCheckedOut', () => {
+    pool.pending--
+    pool.checkedOut++
+    pool.checkouts++
+    notePeaks()
+  })
+  client.on('connectionCheckOutFailed', () => {
+    pool.pending--
+    pool.checkoutFailures++
+  })
+  client.on('connectionCheckedIn', () => { pool.checkedOut-- })
+  client.on('connectionPoolCleared', () => { pool.cleared++ })
+}
+
+function raisePeaks(peaks) {
+  peaks.peakCheckedOut = Math.max(peaks.peakCheckedOut, pool.checkedOut)
+  peaks.peakPending = Math.max(peaks.peakPending, pool.pending)
+}
+
+function notePeaks() {
+  raisePeaks(pool)
+  for (const window of windows.values()) raisePeaks(window.pool)
+}
+
+// The histogram measures timer intervals, so the resolution itself is not lag
+function lagMs(ns) {
+  return Number.isFinite(ns) ? Math.max(0, Math.round((ns / 1e6 - LOOP_RESOLUTION_MS) * 100) / 100) : 0
+}
+
+function loopStats(histogram, since, now) {
+  return {
+    windowMs: now - since,
+    meanLagMs: lagMs(histogram.mean),
+    p99LagMs: lagMs(histogram.percentile(99)),
+    maxLagMs: lagMs(histogram.max)
+  }
+}
+
+function openWindow(now) {
+  if (windows.size >= MAX_WINDOWS) {
+    // The least recently read window goes, so an abandoned poller can't pin a slot
+    const [oldest, window] = windows.entries().next().value
+    window.loopDelay.disable()
+    windows.delete(oldest)
+  }
+  const window = {
+    loopDelay: monitorEventLoopDelay({ resolution: LOOP_RESOLUTION_MS }),
+    started: now,
+    pool: { peakCheckedOut: pool.checkedOut, peakPending: pool.pending }
+  }
+  window.loopDelay.enable()
+  return window
+}
+
+// Lag and pool peaks since this window's previous read, then starts its next interval
+function readWindow(name, now) {
+  const window = windows.get(name) || openWindow(now)
+  windows.delete(name)
+  windows.set(name, window)
+  const reading = { name, eventLoop: loopStats(window.loopDelay, window.started, now), pool: { ...window.pool } }
+  window.loopDelay.reset()
+  window.started = now
+  window.pool = { peakCheckedOut: pool.checkedOut, peakPending: pool.pending }
+  return reading
+}
+
+export function metricsEnabled() {
+  return METRICS_TOKEN !== ''
+}
+
+// GET /metrics is off unless METRICS_TOKEN is set, and then needs it as a bearer token
+export function metricsAuthorized(request) {
+  const given = (request.headers.get('authorization') || '').replace(/^Bearer\s+/i, '')
+  const digest = (value) => crypto.createHash('sha256').update(value).digest()
+  return metricsEnabled() && crypto.timingSafeEqual(digest(given), digest(METRICS_TOKEN))
+}
+
+export function runtimeMetrics(windowName = null) {
+  const memory = process.memoryUsage()
+  const heap = v8.getHeapStatistics()
+  const now = Date.now()
+  const metrics = {
+    rss: memory.rss,
+    heapTotal: memory.heapTotal,
+    heapUsed: memory.heapUsed,
+    heapLimit: heap.heap_size_limit,
+    external: memory.external,
+    arrayBuffers: memory.arrayBuffers,
+    activeResources: process.getActiveResourcesInfo().length,
+    uptime: process.uptime(),
+    eventLoop: loopStats(loopDelay, started, now),
+    pool: { ...pool }
+  }
+  if (windowName) metrics.window = readWindow(windowName, now)
+  return metrics
+}
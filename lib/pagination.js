@@ -0,0 +1,115 @@
+import { ApiError } from '@/lib/errors'
+
+export const DEFAULT_LIMIT = 100
+export const MAX_LIMIT = 1000
+
+function encodeCursor(doc, sortField) {
+  const value = doc[sortField] instanceof Date ? doc[sortField].toISOString() : doc[sortField]
+  return Buffer.from(JSON.stringify([value, doc.id])).toString('base64url')
+}
+
+function decodeCursor(cursor, sortField) {
+  try {
+    const [value, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'))
+    if (typeof id !== 'string') throw new Error('missing id')
+    const isDate = typeof value === 'string' && /^\d{4}-\d{2}-\d{2}T/.test(value)
+    return { value: isDate ? new Date(value) : value, id }
+  } catch {
+    throw new ApiError(`Invalid cursor for ${sortField}`)
+  }
+}
+
+// `since=<ISO createdAt>,<id>` is the readable counterpart of `after` used
+// for incremental sync; the id part may be omitted. It always filters on
+// createdAt, whatever the list is sorted by.
+export function parseSince(raw) {
+  const comma = raw.indexOf(',')
+  const value = new Date(comma < 0 ? raw : raw.slice(0, comma))
+  const id = comma < 0 ? '' : raw.slice(comma + 1)
+  if (Number.isNaN(value.getTime())) {
+    throw new ApiError('since must be <ISO timestamp>,<id>')
+  }
+  return { value, id }
+}
+
+export function sinceToken(doc) {
+  return `${doc.createdAt instanceof Date ? doc.createdAt.toISOString() : doc.createdAt},${doc.id}`
+}
+
+// Mongo sorts null and missing values before all others, but range operators
+// never match them, so they need their own branches: after a null cursor an
+// ascending page continues into the non-null values, and a descending page
+// ends with the nulls.
+function pastCursor(sortField, cursor, direction) {
+  const past = direction === 1 ? '$gt' : '$lt'
+  if (cursor.value === null || cursor.value === undefined) {
+    const tie = { [sortField]: null, id: { [past]: cursor.id } }
+    return direction === 1 ? { $or: [tie, { [sortField]: { $ne: null } }] } : tie
+  }
+  const branches = [{ [sortField]: { [past]: cursor.value } }, { [sortField]: cursor.value, id: { [past]: cursor.id } }]
+  if (direction === -1) branches.push({ [sortField]: null })
+  return { $or: branches }
+}
+
+function parseLimit(raw) {
+  if (raw === null) return DEFAULT_LIMIT
+  const limit = Number(raw)
+  if (!Number.isInteger(limit) || limit < 1 || limit > MAX_LIMIT) {
+    throw new ApiError(`limit must be an integer between 1 and ${MAX_LIMIT}`)
+  }
+  return limit
+}
+
+function parseProjection(raw, sortField) {
+  // Mongo's _id is internal; clients address documents by `id`
+  if (!raw) return { _id: 0 }
+  const projection = { _id: 0, id: 1, [sortField]: 1 }
+  for (const field of raw.split(',')) {
+    const name = field.trim()
+    if (!/^[A-Za-z][A-Za-z0-9_.]*$/.test(name)) {
+      throw new ApiError(`Invalid field name: ${name}`)
+    }
+    projection[name] = 1
+  }
+  return projection
+}
+
+// Keyset pagination over (sortField, id). Reads `limit`, `after`, `since`,
+// `order` and `fields` from the query string and never materializes more than one
+// page (plus one lookahead document) of the collection. Without `limit` a page
+// holds DEFAULT_LIMIT documents; callers follow `nextCursor` for the rest.
+export async function findPage(collection, query, searchParams, { sortField = 'createdAt', order = 'asc' } = {}) {
+  const limit = parseLimit(searchParams.get('limit'))
+  const direction = (searchParams.get('order') || order) === 'desc' ? -1 : 1
+  const projection = parseProjection(searchParams.get('fields'), sortField)
+
+  const conditions = [query]
+  const after = searchParams.get('after')
+  if (after) {
+    conditions.push(pastCursor(sortField, decodeCursor(after, sortField), direction))
+  }
+  // Only "created after" is meant here, so neither the sort field nor the
+  // order changes what `since` selects
+  const since = searchParams.get('since')
+  if (since) {
+    conditions.push(pastCursor('createdAt', parseSince(since), 1))
+  }
+  const filter = conditions.length === 1 ? query : { $and: conditions }
+
+  const docs = await collection
+    .find(filter, { projection })
+    .sort({ [sortField]: direction, id: direction })
+    .limit(limit + 1)
+    .toArray()
+
+  const hasMore = docs.length > limit
+  const data = hasMore ? docs.slice(0, limit) : docs
+  return {
+    data,
+    pagination: {
+      limit,
+      hasMore,
+      nextCursor: hasMore ? encodeCursor(data[data.length - 1], sortField) : null
+    }
+  }
+}
@@ -0,0 +1,250 @@
+import { createReadStream } from 'fs'
+import { writeFile } from 'fs/promises'
+import { Readable } from 'stream'
+import { ApiError } from '@/lib/errors'
+
+// Level 0 holds one min/max pair per PEAKS_BASE_SAMPLES frames; each level
+// above halves the resolution until it has at most PEAKS_MIN_COUNT pairs.
+export const PEAKS_BASE_SAMPLES = 256
+export const PEAKS_MIN_COUNT = 512
+const PEAKS_MAGIC = 'SMPK'
+const PEAKS_VERSION = 1
+const HEADER_BYTES = 16
+const LEVEL_BYTES = 12
+const MAX_WAV_HEADER_BYTES = 1024 * 1024
+
+function parseWavHeader(buf) {
+  if (buf.length < 12) return null
+  if (buf.toString('ascii', 0, 4) !== 'RIFF' || buf.toString('ascii', 8, 12) !== 'WAVE') {
+    return { unsupported: 'not a RIFF/WAVE file' }
+  }
+  let offset = 12
+  let fmt = null
+  while (offset + 8 <= buf.length) {
+    const id = buf.toString('ascii', offset, offset + 4)
+    const size = buf.readUInt32LE(offset + 4)
+    const body = offset + 8
+    if (id === 'data') {
+      if (!fmt) return { unsupported: 'data chunk before fmt chunk' }
+      return { ...fmt, dataOffset: body, dataBytes: size === 0 || size === 0xFFFFFFFF ? Infinity : size }
+    }
+    if (body + size > buf.length) return null
+    if (id === 'fmt ') {
+      let audioFormat = buf.readUInt16LE(body)
+      // WAVE_FORMAT_EXTENSIBLE keeps the real format in the sub-format GUID
+      if (audioFormat === 0xFFFE && size >= 26) audioFormat = buf.readUInt16LE(body + 24)
+      fmt = {
+        audioFormat,
+        channels: buf.readUInt16LE(body + 2),
+        sampleRate: buf.readUInt32LE(body + 4),
+        bitsPerSample: buf.readUInt16LE(body + 14)
+      }
+      const supported = (audioFormat === 1 && (fmt.bitsPerSample === 16 || fmt.bitsPerSample === 24)) ||
+        (audioFormat === 3 && fmt.bitsPerSample === 32)
+      if (!supported || fmt.channels < 1) {
+        return { unsupported: `format ${audioFormat} at ${fmt.bitsPerSample} bits` }
+      }
+    }
+    offset = body + size + (size % 2)
+  }
+  return null
+}
+
+// Builds the level 0 min/max pairs from a WAV byte stream fed in arbitrary
+// slices, so it can ride along with upload assembly without a second read.
+// Samples are scanned through typed-array views over each slice; nothing is
+// allocated per sample.
+export class PeakBuilder {
+  constructor() {
+    this.header = Buffer.alloc(0)
+    this.format = null
+    this.unsupported = null
+    this.remaining = 0
+    this.carry = Buffer.alloc(0)
+    this.peaks = new Int16Array(4096)
+    this.count = 0
+    this.fill = 0
+    this.lo = Infinity
+    this.hi = -Infinity
+    this.elapsed = 0n
+  }
+
+  push(buf) {
+    if (this.unsupported) return
+    const started = process.hrtime.bigint()
+    if (!this.format) {
+      this.header = Buffer.concat([this.header, buf])
+      const parsed = parseWavHeader(this.header)
+      if (!parsed) {
+        if (this.header.length > MAX_WAV_HEADER_BYTES) this.unsupported = 'WAV header too large'
+        this.elapsed += process.hrtime.bigint() - started
+        return
+      }
+      if (parsed.unsupported) {
+        this.unsupported = parsed.unsupported
+        this.header = null
+        return
+      }
+      this.format = parsed
+      this.remaining = parsed.dataBytes
+      buf = this.header.subarray(parsed.dataOffset)
+      this.header = null
+    }
+    if (this.remaining !== Infinity && buf.length > this.remaining) buf = buf.subarray(0, this.remaining)
+    this.remaining -= buf.length
+    if (this.carry.length) {
+      buf = Buffer.concat([this.carry, buf])
+    }
+    const frameBytes = this.format.channels * (this.format.bitsPerSample / 8)
+    const whole = buf.length - (buf.length % frameBytes)
+    this.scan(buf.subarray(0, whole))
+    this.carry = Buffer.from(buf.subarray(whole))
+    this.elapsed += process.hrtime.bigint() - started
+  }
+
+  view(buf) {
+    const { bitsPerSample } = this.format
+    if (bitsPerSample === 24) {
+      // Keep the top 16 bits so every format lands in the same Int16 range
+      const out = new Int32Array(buf.length / 3)
+      for (let i = 0, j = 0; j < out.length; i += 3, j++) {
+        out[j] = (buf[i + 2] << 24 | buf[i + 1] << 16 | buf[i] << 8) >> 16
+      }
+      return out
+    }
+    const Type = bitsPerSample === 16 ? Int16Array : Float32Array
+    // Typed arrays need an aligned offset; pooled buffers don't always have one
+    const aligned = buf.byteOffset % Type.BYTES_PER_ELEMENT === 0 ? buf : Buffer.from(buf)
+    return new Type(aligned.buffer, aligned.byteOffset, aligned.length / Type.BYTES_PER_ELEMENT)
+  }
+
+  scan(buf) {
+    if (!buf.length) return
+    const samples = this.view(buf)
+    const bucket = PEAKS_BASE_SAMPLES * this.format.channels
+    let lo = this.lo
+    let hi = this.hi
+    let fill = this.fill
+    let i = 0
+    while (i < samples.length) {
+      const end = Math.min(samples.length, i + bucket - fill)
+      for (let j = i; j < end; j++) {
+        const value = samples[j]
+        if (value < lo) lo = value
+        if (value > hi) hi = value
+      }
+      fill += end - i
+      i = end
+      if (fill === bucket) {
+        this.emit(lo, hi)
+        lo = Infinity
+        hi = -Infinity
+        fill = 0
+      }
+    }
+    this.lo = lo
+    this.hi = hi
+    this.fill = fill
+  }
+
+  emit(lo, hi) {
+    if (this.count * 2 === this.peaks.length) {
+      const grown = new Int16Array(this.peaks.length * 2)
+      grown.set(this.peaks)
+      this.peaks = grown
+    }
+    const scale = this.format.audioFormat === 3 ? 32767 : 1
+    this.peaks[this.count * 2] = Math.max(-32768, Math.min(32767, Math.round(lo * scale)))
+    this.peaks[this.count * 2 + 1] = Math.max(-32768, Math.min(32767, Math.round(hi * scale)))
+    this.count++
+  }
+
+  // Returns the pyramid as a list of Int16Array levels, or null when the
+  // stream wasn't a WAV this builder understands.
+  finish() {
+    if (this.unsupported || !this.format) return null
+    const started = process.hrtime.bigint()
+    if (this.fill) this.emit(this.lo, this.hi)
+    let level = this.peaks.subarray(0, this.count * 2)
+    const levels = [level]
+    while (level.length / 2 > PEAKS_MIN_COUNT) {
+      const count = Math.ceil(level.length / 4)
+      const next = new Int16Array(count * 2)
+      for (let i = 0; i < count; i++) {
+        const a = i * 4
+        const b = Math.min(a + 2, level.length - 2)
+        next[i * 2] = Math.min(level[a], level[b])
+        next[i * 2 + 1] = Math.max(level[a + 1], level[b + 1])
+      }
+      levels.push(next)
+      level = next
+    }
+    this.elapsed += process.hrtime.bigint() - started
+    return levels
+  }
+
+  get computeMs() {
+    return Number(this.elapsed) / 1e6
+  }
+}
+
+// File layout (little endian):
+//   'SMPK' | u16 version | u16 level count | u32 sample rate | u16 channels | u16 reserved
+//   per level: u32 samples per peak | u32 peak count | u32 byte offset
+//   per level: Int16 min/max pairs
+export async function writePeaksFile(peaksPath, builder) {
+  const levels = builder.finish()
+  if (!levels) return null
+  const { sampleRate, channels } = builder.format
+  const header = Buffer.alloc(HEADER_BYTES + LEVEL_BYTES * levels.length)
+  header.write(PEAKS_MAGIC, 0, 'ascii')
+  header.writeUInt16LE(PEAKS_VERSION, 4)
+  header.writeUInt16LE(levels.length, 6)
+  header.writeUInt32LE(sampleRate, 8)
+  header.writeUInt16LE(channels, 12)
+
+  let offset = header.length
+  const table = levels.map((level, index) => {
+    const entry = { samplesPerPeak: PEAKS_BASE_SAMPLES * 2 ** index, count: level.length / 2, offset }
+    header.writeUInt32LE(entry.samplesPerPeak, HEADER_BYTES + index * LEVEL_BYTES)
+    header.writeUInt32LE(entry.count, HEADER_BYTES + index * LEVEL_BYTES + 4)
+    header.writeUInt32LE(entry.offset, HEADER_BYTES + index * LEVEL_BYTES + 8)
+    offset += level.byteLength
+    return entry
+  })
+  // Int16Array memory is already little endian on every platform Node ships for
+  await writeFile(peaksPath, [header, ...levels.map((level) => Buffer.from(level.buffer, level.byteOffset, level.byteLength))])
+  return {
+    path: peaksPath,
+    sampleRate,
+    channels,
+    duration: (levels[0].length / 2) * PEAKS_BASE_SAMPLES / sampleRate,
+    levels: table,
+    bytes: offset,
+    computeMs: Math.round(builder.computeMs * 100) / 100
+  }
+}
+
+// Streams one level's min/max pairs straight from the .peaks file
+export function peaksResponse(peaks, levelParam) {
+  const level = levelParam === null ? 0 : Number(levelParam)
+  if (!Number.isInteger(level) || level < 0 || level >= peaks.levels.length) {
+    throw new ApiError(`level must be between 0 and ${peaks.levels.length - 1}`)
+  }
+  const { samplesPerPeak, count, offset } = peaks.levels[level]
+  const body = count
+    ? Readable.toWeb(createReadStream(peaks.path, { start: offset, end: offset + count * 4 - 1 }))
+    : null
+  return new Response(body, {
+    headers: {
+      'Content-Type': 'application/octet-stream',
+      'Content-Length': String(count * 4),
+      'X-Peaks-Format': 'int16le-minmax',
+      'X-Peaks-Level': String(level),
+      'X-Peaks-Levels': String(peaks.levels.length),
+      'X-Peaks-Samples-Per-Peak': String(samplesPerPeak),
+      'X-Peaks-Sample-Rate': String(peaks.sampleRate),
+      'X-Peaks-Count': String(count)
+    }
+  })
+}
@@ -0,0 +1,212 @@
+import os from 'os'
+import { v4 as uuidv4 } from 'uuid'
+import { removeStoredFile } from '@/lib/uploads'
+import { errorFields, logger } from '@/lib/logger'
+
+export const PURGE_BATCH_SIZE = Number(process.env.PURGE_BATCH_SIZE || 1000)
+const LEASE_MS = Number(process.env.PURGE_LEASE_MS || 60000)
+const WORKER_ID = `${os.hostname()}:${process.pid}:${uuidv4()}`
+
+// Dependent data is removed in this order. A file's comments go before the
+// file itself, so an interrupted job can always find them again on resume.
+const PHASES = ['messages', 'comments', 'audioFiles', 'project']
+
+// Projects marked for deletion keep their document until the purge finishes;
+// every read of projects filters them out with this clause.
+export const NOT_DELETED = { deletedAt: { $exists: false } }
+export const DELETED = { deletedAt: { $exists: true } }
+
+// The ids among projectIds whose project is tombstoned and still being purged
+export async function purgingProjects(db, projectIds) {
+  const ids = [...new Set(projectIds.filter((id) => typeof id === 'string'))]
+  if (!ids.length) return new Set()
+  const projects = await db.collection('projects')
+    .find({ id: { $in: ids }, ...DELETED }, { projection: { _id: 0, id: 1 } })
+    .toArray()
+  return new Set(projects.map((project) => project.id))
+}
+
+// Tombstones the project and queues its purge job. Returns the job, or null
+// if there is no such project. Deleting an already tombstoned project returns
+// the job that is already running.
+export async function scheduleProjectPurge(db, projectId) {
+  const now = new Date()
+  const project = await db.collection('projects').findOneAndUpdate(
+    { id: projectId, ...NOT_DELETED },
+    { $set: { deletedAt: now, updatedAt: now } },
+    { returnDocument: 'after' }
+  )
+  if (!project) {
+    return db.collection('purgeJobs').findOne({ projectId, status: { $ne: 'completed' } }, { projection: { _id: 0 } })
+  }
+
+  const [messages, comments, audioFiles] = await Promise.all([
+    db.collection('messages').countDocuments({ projectId }),
+    db.collection('comments').countDocuments({ projectId }),
+    db.collection('audioFiles').countDocuments({ projectId })
+  ])
+  const job = {
+    id: uuidv4(),
+    projectId,
+    status: 'pending',
+    phase: PHASES[0],
+    totals: { messages, comments, audioFiles },
+    deleted: { messages: 0, comments: 0, audioFiles: 0 },
+    createdAt: now,
+    updatedAt: now
+  }
+  await db.collection('purgeJobs').insertOne(job)
+  delete job._id
+  return job
+}
+
+export function purgeProgress(job) {
+  const total = Object.values(job.totals).reduce((sum, n) => sum + n, 0)
+  const deleted = Object.values(job.deleted).reduce((sum, n) => sum + n, 0)
+  return {
+    jobId: job.id,
+    projectId: job.projectId,
+    status: job.status,
+    phase: job.phase,
+    totals: job.totals,
+    deleted: job.deleted,
+    // File comments aren't in the up-front totals, so deleted can overshoot
+    progress: job.status === 'completed' ? 100 : Math.min(99, total ? (deleted / total) * 100 : 0),
+    createdAt: job.createdAt,
+    completedAt: job.completedAt || null
+  }
+}
+
+// Claims the next runnable job: a pending one, or one whose worker stopped
+// renewing its lease (crashed or restarted process).
+async function claimJob(jobs) {
+  const now = new Date()
+  return jobs.findOneAndUpdate(
+    {
+      $or: [
+        { status: 'pending' },
+        { status: 'running', leaseUntil: { $lt: now } }
+      ]
+    },
+    { $set: { status: 'running', worker: WORKER_ID, leaseUntil: new Date(now.getTime() + LEASE_MS), updatedAt: now } },
+    { sort: { createdAt: 1 }, returnDocument: 'after' }
+  )
+}
+
+// Records a finished batch and extends the lease. Returns false when another
+// worker has taken the job over, so this one stops touching it.
+async function recordBatch(jobs, job, counts, phase = job.phase) {
+  const now = new Date()
+  const inc = {}
+  for (const [name, count] of Object.entries(counts)) {
+    if (count) inc[`deleted.${name}`] = count
+  }
+  const result = await jobs.updateOne(
+    { id: job.id, worker: WORKER_ID },
+    {
+      ...(Object.keys(inc).length ? { $inc: inc } : {}),
+      $set: { phase, leaseUntil: new Date(now.getTime() + LEASE_MS), updatedAt: now }
+    }
+  )
+  return result.matchedCount === 1
+}
+
+async function deleteBatch(collection, query) {
+  const ids = (await collection.find(query, { projection: { _id: 0, id: 1 } }).limit(PURGE_BATCH_SIZE).toArray())
+    .map((doc) => doc.id)
+  if (!ids.length) return 0
+  const result = await collection.deleteMany({ id: { $in: ids } })
+  return result.deletedCount
+}
+
+// Each step deletes at most one batch and reports what it removed; a step
+// that removes nothing means the phase is done.
+async function purgeStep(db, job) {
+  const { projectId } = job
+  if (job.phase === 'messages') {
+    return { messages: await deleteBatch(db.collection('messages'), { projectId }) }
+  }
+  if (job.phase === 'comments') {
+    return { comments: await deleteBatch(db.collection('comments'), { projectId }) }
+  }
+  if (job.phase === 'audioFiles') {
+    const files = await db.collection('audioFiles')
+      .find({ projectId }, { projection: { _id: 0, id: 1, storagePath: 1, 'peaks.path': 1 } })
+      .limit(PURGE_BATCH_SIZE)
+      .toArray()
+    if (!files.length) return { audioFiles: 0 }
+    const fileIds = files.map((file) => file.id)
+    const comments = await deleteBatch(db.collection('comments'), { fileId: { $in: fileIds } })
+    if (comments) return { comments }
+    await Promise.all(files.flatMap((file) => [removeStoredFile(file.storagePath), removeStoredFile(file.peaks?.path)]))
+    const result = await db.collection('audioFiles').deleteMany({ id: { $in: fileIds } })
+    return { audioFiles: result.deletedCount }
+  }
+  await db.collection('projects').deleteOne({ id: projectId, deletedAt: { $exists: true } })
+  return {}
+}
+
+async function runJob(db, jobs, job, onChange) {
+  let phaseIndex = PHASES.indexOf(job.phase)
+  while (phaseIndex < PHASES.length) {
+    const phase = PHASES[phaseIndex]
+    const counts = await purgeStep(db, { ...job, phase })
+    const removed = Object.values(counts).reduce((sum, n) => sum + n, 0)
+    if (removed) await onChange(...Object.keys(counts))
+    if (phase === 'project' || !removed) phaseIndex++
+    const nextPhase = PHASES[Math.min(phaseIndex, PHASES.length - 1)]
+    if (!(await recordBatch(jobs, job, counts, nextPhase))) return
+  }
+  await jobs.updateOne(
+    { id: job.id, worker: WORKER_ID },
+    { $set: { status: 'completed', completedAt: new Date(), updatedAt: new Date() }, $unset: { leaseUntil: '', worker: '' } }
+  )
+  await onChange('projects')
+  logger.info('Purged project', { projectId: job.projectId })
+}
+
+let draining = null
+let rerun = false
+let wakeTimer = null
+
+function wakeAt(db, onChange, at) {
+  clearTimeout(wakeTimer)
+  wakeTimer = setTimeout(() => startPurgeWorker(db, onChange), Math.max(0, at - Date.now()) + 50)
+  wakeTimer.unref?.()
+}
+
+// Starts the in-process worker if it isn't already draining. Safe to call on
+// every delete and on connect. Once drained it sleeps until the earliest
+// running job's lease runs out, so a job left by a crashed or restarted
+// process (or by a failed run here) is resumed without waiting for a delete.
+export function startPurgeWorker(db, onChange = () => {}) {
+  if (draining) {
+    rerun = true
+    return draining
+  }
+  draining = (async () => {
+    const jobs = db.collection('purgeJobs')
+    do {
+      rerun = false
+      let job
+      while ((job = await claimJob(jobs))) {
+        try {
+          await runJob(db, jobs, job, onChange)
+        } catch (error) {
+          // The lease is left to expire so the job resumes from its last phase
+          logger.error('Project purge failed', { projectId: job.projectId, ...errorFields(error) })
+        }
+      }
+    } while (rerun)
+
+    const [running] = await jobs.find({ status: 'running' }, { projection: { _id: 0, leaseUntil: 1 } })
+      .sort({ leaseUntil: 1 }).limit(1).toArray()
+    if (running?.leaseUntil) wakeAt(db, onChange, running.leaseUntil.getTime())
+  })().catch((error) => {
+    logger.error('Purge worker failed', errorFields(error))
+    wakeAt(db, onChange, Date.now() + LEASE_MS)
+  }).finally(() => {
+    draining = null
+  })
+  return draining
+}
@@ -0,0 +1,66 @@
+import { AsyncLocalStorage } from 'async_hooks'
+import { logger } from '@/lib/logger'
+
+// Per-request timing. Each handler runs inside its own store; Mongo command
+// events add their durations to the store of the request that issued them,
+// and the totals go out as a Server-Timing header.
+const requestContext = new AsyncLocalStorage()
+// Command ids are only unique per connection, hence the connection in the key
+const inFlight = new Map()
+
+function commandKey(event) {
+  return `${event.connectionId}:${event.requestId}`
+}
+
+// Hooks command monitoring (the client needs `monitorCommands: true`)
+export function watchCommands(client) {
+  client.on('commandStarted', (event) => {
+    const timing = requestContext.getStore()
+    if (timing) inFlight.set(commandKey(event), timing)
+  })
+  const finished = (event) => {
+    const key = commandKey(event)
+    const timing = inFlight.get(key)
+    if (!timing) return
+    inFlight.delete(key)
+    timing.dbMs += event.duration
+    timing.dbCommands++
+  }
+  client.on('commandSucceeded', finished)
+  client.on('commandFailed', finished)
+}
+
+// Runs `fn` outside the current request, e.g. to start a background worker
+// whose queries shouldn't count towards the request that woke it
+export function outsideRequest(fn) {
+  return requestContext.exit(fn)
+}
+
+function serverTiming({ dbMs, dbCommands }, totalMs) {
+  // Concurrent commands overlap, so their summed time can exceed the wall clock
+  const handlerMs = Math.max(0, totalMs - dbMs)
+  return `db;dur=${dbMs.toFixed(1)};desc="${dbCommands} commands", ` +
+    `handler;dur=${handlerMs.toFixed(1)}, total;dur=${totalMs.toFixed(1)}`
+}
+
+// Wraps a route handler so every response carries Server-Timing and is
+// offered to the (sampled) request log
+export function instrument(method, handler) {
+  return (request, context) => {
+    const timing = { started: process.hrtime.bigint(), dbMs: 0, dbCommands: 0 }
+    return requestContext.run(timing, async () => {
+      const response = await handler(request, context)
+      const totalMs = Number(process.hrtime.bigint() - timing.started) / 1e6
+      response.headers.set('Server-Timing', serverTiming(timing, totalMs))
+      logger.request({
+        method,
+        path: context.params.path?.join('/') || '',
+        status: response.status,
+        ms: Math.round(totalMs * 10) / 10,
+        dbMs: Math.round(timing.dbMs * 10) / 10,
+        dbCommands: timing.dbCommands
+      })
+      return response
+    })
+  }
+}
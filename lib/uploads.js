@@ -0,0 +1,289 @@
+import { createReadStream, createWriteStream } from 'fs'
+import { access, mkdir, rename, rm } from 'fs/promises'
+import { once } from 'events'
+import { pipeline } from 'stream/promises'
+import { Readable } from 'stream'
+import { createHash } from 'crypto'
+import os from 'os'
+import path from 'path'
+import { v4 as uuidv4 } from 'uuid'
+import { ApiError } from '@/lib/errors'
+import { PeakBuilder, writePeaksFile } from '@/lib/peaks'
+import { errorFields, logger } from '@/lib/logger'
+
+export const UPLOAD_DIR = process.env.UPLOAD_DIR || path.join(os.tmpdir(), 'studiomate-uploads')
+const SPOOL_DIR = path.join(UPLOAD_DIR, 'spool')
+const FILES_DIR = path.join(UPLOAD_DIR, 'files')
+const UPLOAD_ID_PATTERN = /^[A-Za-z0-9_-]{1,128}$/
+// An assembler renews its lease while it works; one that crashed loses the
+// upload to the next chunk request once the lease runs out
+const ASSEMBLY_LEASE_MS = Number(process.env.UPLOAD_ASSEMBLY_LEASE_MS || 10 * 60 * 1000)
+
+export class UploadError extends ApiError {}
+
+// Clients that predate resumable uploads send no uploadId, but they always
+// send their chunks in order. So chunk 0 opens a fresh upload under a random
+// nonce, and the chunks after it find that upload through a pointer keyed by
+// project, file name and client. Two clients sending the same file never
+// share parts, and uploading a file again never replays the earlier upload.
+export async function legacyUploadId(db, { projectId, fileName, chunkIndex, client }) {
+  const key = 'legacy-' + createHash('sha1').update(JSON.stringify([projectId, fileName, client])).digest('hex')
+  const pointers = db.collection('legacyUploads')
+  if (chunkIndex !== 0) {
+    const pointer = await pointers.findOne({ key })
+    if (!pointer) throw new UploadError('Uploads without an uploadId must start with chunk 0', 409)
+    return pointer.uploadId
+  }
+  const uploadId = `${key}-${uuidv4()}`
+  const point = () => pointers.updateOne({ key }, { $set: { uploadId, updatedAt: new Date() } }, { upsert: true })
+  try {
+    await point()
+  } catch (error) {
+    if (error.code !== 11000) throw error
+    await point()
+  }
+  return uploadId
+}
+
+function spoolDir(uploadId) {
+  if (!UPLOAD_ID_PATTERN.test(uploadId)) {
+    throw new UploadError('Invalid uploadId')
+  }
+  return path.join(SPOOL_DIR, uploadId)
+}
+
+function partPath(uploadId, chunkIndex) {
+  return path.join(spoolDir(uploadId), `${chunkIndex}.part`)
+}
+
+// Streams one chunk to <spool>/<uploadId>/<index>.part. The data goes to a
+// temp name first so an interrupted request never leaves a partial part behind.
+async function spoolChunk(uploadId, chunkIndex, source) {
+  await mkdir(spoolDir(uploadId), { recursive: true })
+  const finalPath = partPath(uploadId, chunkIndex)
+  const tempPath = `${finalPath}.${uuidv4()}.tmp`
+  const input = Buffer.isBuffer(source) ? Readable.from([source]) : Readable.fromWeb(source)
+  let bytes = 0
+  input.on('data', (buf) => { bytes += buf.length })
+  try {
+    await pipeline(input, createWriteStream(tempPath))
+    await rename(tempPath, finalPath)
+  } catch (error) {
+    await rm(tempPath, { force: true })
+    throw error
+  }
+  return bytes
+}
+
+// Appends every part to the destination in index order, hashing the same
+// buffers on the way through and feeding them to the waveform peak builder:
+// each byte is read once and written once.
+async function assembleParts(uploadId, totalChunks, fileId, fileName) {
+  await mkdir(FILES_DIR, { recursive: true })
+  const extension = path.extname(fileName || '').replace(/[^A-Za-z0-9.]/g, '')
+  const destination = path.join(FILES_DIR, `${fileId}${extension}`)
+  const output = createWriteStream(destination)
+  const hash = createHash('sha256')
+  const peakBuilder = new PeakBuilder()
+  let size = 0
+  try {
+    for (let index = 0; index < totalChunks; index++) {
+      for await (const buf of createReadStream(partPath(uploadId, index))) {
+        hash.update(buf)
+        peakBuilder.push(buf)
+        size += buf.length
+        if (!output.write(buf)) await once(output, 'drain')
+      }
+    }
+    output.end()
+    await once(output, 'finish')
+  } catch (error) {
+    output.destroy()
+    await rm(destination, { force: true })
+    throw error
+  }
+
+  let peaks = null
+  try {
+    peaks = await writePeaksFile(path.join(FILES_DIR, `${fileId}.peaks`), peakBuilder)
+  } catch (error) {
+    // Waveform data is a convenience; the upload itself has succeeded
+    logger.warn('Peak generation failed', { fileName, ...errorFields(error, false) })
+  }
+  return { storagePath: destination, size, checksum: hash.digest('hex'), peaks }
+}
+
+// Indices whose part file is gone from the spool (e.g. the disk was cleaned)
+async function lostParts(uploadId, totalChunks) {
+  const lost = []
+  for (let index = 0; index < totalChunks; index++) {
+    try {
+      await access(partPath(uploadId, index))
+    } catch {
+      lost.push(index)
+    }
+  }
+  return lost
+}
+
+function missingChunks(upload) {
+  const received = new Set(upload.receivedChunks)
+  const missing = []
+  for (let index = 0; index < upload.totalChunks; index++) {
+    if (!received.has(index)) missing.push(index)
+  }
+  return missing
+}
+
+export async function receiveChunk(db, { uploadId, fileName, projectId, totalChunks, chunkIndex }, source) {
+  if (!Number.isInteger(totalChunks) || totalChunks < 1) {
+    throw new UploadError('totalChunks must be a positive integer')
+  }
+  if (!Number.isInteger(chunkIndex) || chunkIndex < 0 || chunkIndex >= totalChunks) {
+    throw new UploadError(`chunkIndex must be between 0 and ${totalChunks - 1}`)
+  }
+
+  const uploads = db.collection('uploads')
+  const existing = await uploads.findOne({ uploadId })
+  if (existing?.status === 'failed') {
+    throw new UploadError(`Upload ${uploadId} failed (${existing.error}); start a new upload`, 409)
+  }
+  if (existing?.status === 'completed') {
+    const audioFile = await db.collection('audioFiles').findOne({ id: existing.audioFileId })
+    return { completed: true, data: audioFile }
+  }
+  if (existing?.status === 'assembling' && existing.leaseUntil > new Date()) {
+    return { completed: false, uploadId, progress: 100 }
+  }
+  if (existing && existing.totalChunks !== totalChunks) {
+    throw new UploadError(`Upload ${uploadId} was started with ${existing.totalChunks} chunks`, 409)
+  }
+
+  const bytes = await spoolChunk(uploadId, chunkIndex, source)
+  const now = new Date()
+  const record = () => uploads.updateOne(
+    { uploadId },
+    {
+      $addToSet: { receivedChunks: chunkIndex },
+      $set: { [`chunkSizes.${chunkIndex}`]: bytes, updatedAt: now },
+      $setOnInsert: { uploadId, fileName, projectId, totalChunks, status: 'receiving', createdAt: now }
+    },
+    { upsert: true }
+  )
+  try {
+    await record()
+  } catch (error) {
+    // Two first chunks racing on the upsert: the loser retries as a plain update
+    if (error.code !== 11000) throw error
+    await record()
+  }
+
+  // Exactly one request wins the transition to 'assembling' (or takes over a stalled one)
+  const claim = uuidv4()
+  const claimedAt = new Date()
+  const claimed = await uploads.findOneAndUpdate(
+    {
+      uploadId,
+      $or: [{ status: 'receiving' }, { status: 'assembling', leaseUntil: { $lt: claimedAt } }],
+      $expr: { $gte: [{ $size: '$receivedChunks' }, '$totalChunks'] }
+    },
+    { $set: { status: 'assembling', claim, leaseUntil: new Date(claimedAt.getTime() + ASSEMBLY_LEASE_MS), updatedAt: claimedAt } },
+    { returnDocument: 'after' }
+  )
+  if (!claimed) {
+    const upload = await uploads.findOne({ uploadId })
+    return {
+      completed: false,
+      uploadId,
+      progress: (upload.receivedChunks.length / upload.totalChunks) * 100
+    }
+  }
+
+  // The file id is fixed by the first claim, so a takeover overwrites the same
+  // destination and finds the audio file if the crash came after inserting it
+  const fileId = claimed.audioFileId || uuidv4()
+  if (!claimed.audioFileId) {
+    await uploads.updateOne({ uploadId, claim }, { $set: { audioFileId: fileId } })
+  }
+  const heartbeat = setInterval(() => {
+    uploads.updateOne({ uploadId, claim }, { $set: { leaseUntil: new Date(Date.now() + ASSEMBLY_LEASE_MS) } })
+      .catch(() => {})
+  }, ASSEMBLY_LEASE_MS / 3)
+  heartbeat.unref?.()
+  let audioFile
+  try {
+    audioFile = await db.collection('audioFiles').findOne({ id: fileId }, { projection: { _id: 0 } }) ||
+      await assembleAudioFile(db, uploadId, totalChunks, fileId, claimed)
+  } catch (error) {
+    // Parts that went missing are asked for again, so the client can resume;
+    // any other failure would only repeat, so the upload is given up
+    const lost = await lostParts(uploadId, totalChunks)
+    const unset = { claim: '', leaseUntil: '' }
+    lost.forEach((index) => { unset[`chunkSizes.${index}`] = '' })
+    await uploads.updateOne(
+      { uploadId, claim },
+      lost.length
+        ? { $set: { status: 'receiving', updatedAt: new Date() }, $pull: { receivedChunks: { $in: lost } }, $unset: unset }
+        : { $set: { status: 'failed', error: error.message, updatedAt: new Date() }, $unset: unset }
+    )
+    logger.error('Upload assembly failed', { uploadId, lostChunks: lost, ...errorFields(error, !lost.length) })
+    if (lost.length) throw new UploadError(`Chunks ${lost.join(', ')} of upload ${uploadId} were lost; send them again`, 409)
+    throw error
+  } finally {
+    clearInterval(heartbeat)
+  }
+  await uploads.updateOne(
+    { uploadId, claim },
+    { $set: { status: 'completed', completedAt: new Date(), updatedAt: new Date() }, $unset: { claim: '', leaseUntil: '' } }
+  )
+  // Parts stay until the upload is completed, so a crashed assembly can be redone
+  await rm(spoolDir(uploadId), { recursive: true, force: true })
+  return { completed: true, data: audioFile }
+}
+
+async function assembleAudioFile(db, uploadId, totalChunks, fileId, claimed) {
+  const assembled = await assembleParts(uploadId, totalChunks, fileId, claimed.fileName)
+  const audioFile = {
+    id: fileId,
+    name: claimed.fileName,
+    projectId: claimed.projectId,
+    size: assembled.size,
+    checksum: { algorithm: 'sha256', value: assembled.checksum },
+    storagePath: assembled.storagePath,
+    peaks: assembled.peaks,
+    uploadedAt: new Date(),
+    uploadedBy: 'Current User',
+    version: 'v1',
+    type: 'recording'
+  }
+  try {
+    await db.collection('audioFiles').insertOne(audioFile)
+  } catch (error) {
+    // An assembler that took over from this one already inserted it
+    if (error.code !== 11000) throw error
+  }
+  delete audioFile._id
+  return audioFile
+}
+
+export async function uploadStatus(db, uploadId) {
+  const upload = await db.collection('uploads').findOne({ uploadId })
+  if (!upload) return null
+  return {
+    uploadId,
+    fileName: upload.fileName,
+    projectId: upload.projectId,
+    status: upload.status,
+    totalChunks: upload.totalChunks,
+    receivedChunks: upload.receivedChunks.length,
+    missingChunks: missingChunks(upload),
+    audioFileId: upload.status === 'completed' ? upload.audioFileId : null,
+    error: upload.error || null
+  }
+}
+
+export async function removeStoredFile(storagePath) {
+  if (storagePath && storagePath.startsWith(FILES_DIR)) {
+    await rm(storagePath, { force: true })
+  }
+}
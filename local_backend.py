@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+StudioMate Local Backend
+Brings up a throwaway MongoDB and the Next.js API on this machine, waits for
+the API to answer, runs backend_test.py (or the benchmark suite) against it
+and tears everything down, so timings don't depend on the preview host or the
+network in between.
+
+    python local_backend.py                      # full suite
+    python local_backend.py -- --load --users 10,50
+    python local_backend.py --bench -- --seed-projects 200
+    python local_backend.py --serve              # keep it up for manual runs
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+READY_PATH = "/api/metrics"
+DEFAULT_SMTP_SINK_PORT = 2525
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def log_tail(path, lines=30):
+    try:
+        with open(path, errors="replace") as fh:
+            return "".join(fh.readlines()[-lines:])
+    except OSError:
+        return ""
+
+def wait_until(check, timeout, process, what, log_path):
+    """Poll `check` until it is true, failing early if `process` exits"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"{what} exited with code {process.returncode}:\n{log_tail(log_path)}")
+        if check():
+            return
+        time.sleep(0.25)
+    raise SystemExit(f"{what} not ready after {timeout:.0f}s:\n{log_tail(log_path)}")
+
+def port_open(port):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def api_ready(url, metrics_token):
+    # Every handler connects to Mongo and creates the indexes first, so a
+    # 200 here means the whole stack is usable
+    request = urllib.request.Request(url, headers={"Authorization": f"Bearer {metrics_token}"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+class LocalStack:
+    """Child processes and scratch directories, torn down in reverse order"""
+
+    def __init__(self, keep=False):
+        self.keep = keep
+        self.workdir = tempfile.mkdtemp(prefix="studiomate-local-")
+        self.processes = []
+        self.cleanups = []
+
+    def spawn(self, name, command, env=None, cwd=ROOT):
+        log_path = os.path.join(self.workdir, f"{name}.log")
+        log = open(log_path, "w")
+        # A session of its own lets teardown signal npm/next and their children together
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+        self.processes.append((name, process, log))
+        return process, log_path
+
+    def close(self):
+        for name, process, log in reversed(self.processes):
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGTERM)
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
+            log.close()
+        for cleanup in reversed(self.cleanups):
+            cleanup()
+        if self.keep:
+            print(f"Kept logs and data in {self.workdir}")
+        else:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def start_mongo(stack, args, db_name):
+    """Returns the Mongo URL, starting a private mongod unless --mongo-url is given"""
+    if args.mongo_url:
+        if not args.keep:
+            stack.cleanups.append(lambda: drop_database(args.mongo_url, db_name))
+        return args.mongo_url
+    binary = args.mongod or shutil.which("mongod")
+    if not binary:
+        raise SystemExit("mongod not found: install MongoDB, pass --mongod PATH or use --mongo-url")
+    # On tmpfs the data never touches a disk, which is as close to an
+    # in-memory engine as the community server gets
+    parent = "/dev/shm" if args.in_memory and os.path.isdir("/dev/shm") else stack.workdir
+    dbpath = tempfile.mkdtemp(prefix="studiomate-mongo-", dir=parent)
+    if parent != stack.workdir:
+        stack.cleanups.append(lambda: shutil.rmtree(dbpath, ignore_errors=True))
+    port = free_port()
+    process, log_path = stack.spawn("mongod", [
+        binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1",
+        "--wiredTigerCacheSizeGB", str(args.mongo_cache_gb),
+    ])
+    wait_until(lambda: port_open(port), args.timeout, process, "mongod", log_path)
+    return f"mongodb://127.0.0.1:{port}"
+
+def drop_database(mongo_url, db_name):
+    try:
+        from pymongo import MongoClient
+    except ImportError:
+        print(f"pymongo not installed; scratch database {db_name} left in place")
+        return
+    with MongoClient(mongo_url, serverSelectionTimeoutMS=5000) as client:
+        client.drop_database(db_name)
+
+def next_command(args, port):
+    """Command that serves the API: the standalone production build, or next dev"""
+    npx = shutil.which("npx")
+    if args.mode == "dev":
+        if not npx:
+            raise SystemExit("npx not found: install Node.js")
+        return [npx, "next", "dev", "--hostname", "127.0.0.1", "--port", str(port)]
+    server = os.path.join(ROOT, ".next", "standalone", "server.js")
+    if args.build or not os.path.exists(server):
+        if not npx:
+            raise SystemExit("npx not found: install Node.js")
+        print("Building the API (next build)...")
+        subprocess.run([npx, "next", "build"], cwd=ROOT, check=True)
+    return [shutil.which("node") or "node", server]
+
+def start_api(stack, args, mongo_url, db_name, metrics_token):
+    port = args.port or free_port()
+    env = dict(os.environ,
+               NODE_ENV="development" if args.mode == "dev" else "production",
+               PORT=str(port),
+               HOSTNAME="127.0.0.1",
+               MONGO_URL=mongo_url,
+               DB_NAME=db_name,
+               UPLOAD_DIR=os.path.join(stack.workdir, "uploads"),
+               LOG_LEVEL=args.log_level,
+               METRICS_TOKEN=metrics_token,
+               # Emails go to the SMTP sink backend_test.py runs; short backoff keeps retries quick
+               EMAIL_TRANSPORT="smtp",
+               SMTP_HOST="127.0.0.1",
+               SMTP_PORT=str(args.smtp_sink_port),
+               EMAIL_BACKOFF_BASE_MS="200")
+    process, log_path = stack.spawn("api", next_command(args, port), env=env)
+    base_url = f"http://127.0.0.1:{port}/api"
+    wait_until(lambda: api_ready(base_url[:-len("/api")] + READY_PATH, metrics_token), args.timeout, process, "API", log_path)
+    return base_url
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the StudioMate API locally and test it",
+                                     epilog="Arguments after -- are passed to backend_test.py or the benchmarks")
+    parser.add_argument("--mongo-url", help="use this MongoDB instead of starting one (a scratch database is used)")
+    parser.add_argument("--mongod", help="mongod binary to start (default: the one on PATH)")
+    parser.add_argument("--in-memory", action="store_true", help="keep the private mongod's data on /dev/shm")
+    parser.add_argument("--mongo-cache-gb", type=float, default=0.5, help="WiredTiger cache for the private mongod")
+    parser.add_argument("--mode", choices=("start", "dev"), default="start",
+                        help="serve the production build (default) or run next dev")
+    parser.add_argument("--build", action="store_true", help="run next build even if a build exists")
+    parser.add_argument("--port", type=int, help="API port (default: a free one)")
+    parser.add_argument("--smtp-sink-port", type=int, default=DEFAULT_SMTP_SINK_PORT,
+                        help="port of backend_test.py's SMTP sink, where the API sends email")
+    parser.add_argument("--log-level", default="warn", help="LOG_LEVEL for the API")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds to wait for each service")
+    parser.add_argument("--bench", action="store_true", help="run tests/benchmark_suite.py instead of backend_test.py")
+    parser.add_argument("--serve", action="store_true", help="print the API URL and keep running until Ctrl-C")
+    parser.add_argument("--keep", action="store_true", help="keep logs, uploads and the scratch database")
+    argv = sys.argv[1:] if argv is None else argv
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    args.test_args = argv[split + 1:]
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_name = f"studiomate_local_{uuid.uuid4().hex[:8]}"
+    metrics_token = uuid.uuid4().hex
+    with LocalStack(args.keep) as stack:
+        mongo_url = start_mongo(stack, args, db_name)
+        base_url = start_api(stack, args, mongo_url, db_name, metrics_token)
+        print(f"API ready at {base_url} (database {db_name})")
+        if args.serve:
+            print(f"Run: STUDIOMATE_BASE_URL={base_url} SMTP_SINK_PORT={args.smtp_sink_port} "
+                  f"STUDIOMATE_METRICS_TOKEN={metrics_token} python backend_test.py")
+            try:
+                signal.pause()
+            except KeyboardInterrupt:
+                return 0
+        env = dict(os.environ, STUDIOMATE_BASE_URL=base_url, SMTP_SINK_PORT=str(args.smtp_sink_port),
+                   STUDIOMATE_METRICS_TOKEN=metrics_token)
+        runner = ["-m", "tests.benchmark_suite"] if args.bench else [os.path.join(ROOT, "backend_test.py")]
+        command = [sys.executable] + runner + ["--base-url", base_url] + args.test_args
+        return subprocess.call(command, cwd=ROOT, env=env)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+StudioMate Dataset Generator
+Streams a seed-deterministic, production-sized studio dataset into MongoDB
+directly or through the API: projects with their audio files, timeline
+comments, sessions, chat messages and invoices. Documents are generated one
+project at a time and flushed in fixed-size batches, so memory stays flat no
+matter how many are requested. The same seed always yields the same ids,
+names, amounts and times. Seeding through the API leaves every invoice
+'pending' (see ApiTarget), so use --mongo-url when paid invoices matter.
+
+    python seed_dataset.py --mongo-url mongodb://localhost:27017 --db-name studiomate_bench
+    python seed_dataset.py --api http://127.0.0.1:3000/api --projects 200
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CLIENTS = ["Harmony Records", "Blue Note Collective", "Northside Audio", "Velvet Tape Co", "Indie Spark",
+           "Lowlands Music", "Crescent Publishing", "Neon Anthem", "Atlas Film Scores", "Self-released"]
+ARTISTS = ["The Midnight Owls", "Clara Mendes", "Juno Reyes", "Static Bloom", "Orchestra Nova", "DJ Kestrel",
+           "Harbor Lights", "Mira & the Tides", "Ghost Parade", "Sol Quartet"]
+RELEASES = ["Album", "EP", "Single", "Soundtrack", "Live Session", "Remix Pack"]
+ENGINEERS = ["Alex Johnson", "Priya Natarajan", "Marco Rossi", "Kim Larsen", "Dana Brooks", "Yusuf Demir"]
+MEMBERS = ["Producer Mike", "Sarah (A&R)", "Alex Johnson", "Band Manager", "Mix Engineer", "Artist"]
+STEMS = ["Lead Vocal", "Backing Vocals", "Drums", "Bass", "Keys", "Guitar L", "Guitar R", "Strings", "Synth Pad",
+         "Room Mics", "Rough Mix", "Master"]
+COMMENTS = ["Tighten the low end here.", "Vocal is a touch sharp on this line.", "Love this take!",
+            "Can we try a double here?", "Snare needs more body.", "Automate the reverb tail down.",
+            "Timing drifts in this bar.", "Approved for mix.", "Clip on the transient, check gain staging.",
+            "Bring the bass up 1dB in the chorus."]
+MESSAGES = ["Ready for the overdubs?", "Uploaded the new rough mix.", "Can we move Thursday to 2pm?",
+            "Label wants a radio edit.", "Stems are in the project folder.", "Great session today!",
+            "Need the lyric sheet before tracking.", "Mastering booked for next week."]
+# Each room has fixed daily slots, handed out in order, so generated bookings never overlap
+SESSION_SLOTS = [("09:00", "13:00"), ("14:00", "18:00"), ("19:00", "23:00")]
+ROOMS = ["Studio A", "Studio B", "Live Room", "Mix Suite"]
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+def minutes(hhmm):
+    return int(hhmm[:2]) * 60 + int(hhmm[3:])
+
+def poisson(rng, mean):
+    """Poisson count; a rounded normal once the mean is large enough for it to be indistinguishable"""
+    if mean <= 0:
+        return 0
+    if mean > 50:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+    limit, k, p = math.exp(-mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+def heavy_tail(rng, mean, cap):
+    """Pareto-shaped count with the given mean: most items get a few, a handful get a lot"""
+    alpha = 1.6
+    return min(cap, int(rng.paretovariate(alpha) * mean * (alpha - 1) / alpha))
+
+class DatasetGenerator:
+    """Yields (collection, document) pairs in a fixed order for a given seed"""
+
+    def __init__(self, seed, projects, start, days, sessions_per_project, files_per_project,
+                 comments_per_file, messages_per_project, invoices_per_project):
+        self.rng = random.Random(seed)
+        self.projects = projects
+        self.start = start
+        self.days = days
+        self.sessions_per_project = sessions_per_project
+        self.files_per_project = files_per_project
+        self.comments_per_file = comments_per_file
+        self.messages_per_project = messages_per_project
+        self.invoices_per_project = invoices_per_project
+        # One studio business per ~25 projects, each with its own rooms
+        self.studios = [f"{room} @ Studio {n + 1:03d}" for n in range(max(1, projects // 25)) for room in ROOMS]
+        self.slot = 0
+        self.calendar_day = None
+        self.calendars = {}
+
+    def uid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def moment(self, after, within_days):
+        return after + timedelta(seconds=self.rng.uniform(0, within_days * 86400))
+
+    def next_slot(self):
+        """Next free (studio, day, slot) in order, skipping some so rooms aren't fully booked"""
+        self.slot += 1 + min(20, int(self.rng.expovariate(0.6)))
+        per_day = len(self.studios) * len(SESSION_SLOTS)
+        day = self.start + timedelta(days=self.slot // per_day)
+        studio = self.studios[(self.slot % per_day) // len(SESSION_SLOTS)]
+        return studio, day, SESSION_SLOTS[self.slot % len(SESSION_SLOTS)]
+
+    def flush_calendars(self, before_day=None):
+        for key in sorted(self.calendars):
+            if before_day is None or key[1] < before_day:
+                studio, date = key
+                yield "studioCalendars", {"studio": studio, "date": date, "bookings": self.calendars.pop(key)}
+
+    def project(self, index):
+        created = self.start + timedelta(days=self.days * index / self.projects) + timedelta(
+            seconds=self.rng.uniform(0, 3600))
+        status = self.rng.choices(["active", "completed", "on_hold"], weights=[6, 3, 1])[0]
+        return {
+            "id": self.uid(),
+            "name": f"{self.rng.choice(ARTISTS)} - {self.rng.choice(RELEASES)} #{index + 1}",
+            "description": "Tracking, overdubs and mix",
+            "client": self.rng.choice(CLIENTS),
+            "status": status,
+            "budget": round(self.rng.lognormvariate(9.2, 0.7), -1),
+            "createdAt": created,
+            "updatedAt": created,
+        }
+
+    def __iter__(self):
+        for index in range(self.projects):
+            project = self.project(index)
+            yield "projects", project
+            project_id, created = project["id"], project["createdAt"]
+
+            for f in range(max(1, poisson(self.rng, self.files_per_project))):
+                duration = round(self.rng.uniform(90, 420), 2)
+                file_id = self.uid()
+                uploaded = self.moment(created, 60)
+                yield "audioFiles", {
+                    "id": file_id,
+                    "projectId": project_id,
+                    "name": f"{STEMS[f % len(STEMS)]} v{f // len(STEMS) + 1}.wav",
+                    "size": int(duration * 48000 * 2 * 3),
+                    "duration": duration,
+                    "format": "wav",
+                    "uploadedAt": uploaded,
+                }
+                for _ in range(heavy_tail(self.rng, self.comments_per_file, 50 * self.comments_per_file)):
+                    yield "comments", {
+                        "id": self.uid(),
+                        "projectId": project_id,
+                        "fileId": file_id,
+                        "timestamp": round(self.rng.uniform(0, duration), 1),
+                        "text": self.rng.choice(COMMENTS),
+                        "author": self.rng.choice(MEMBERS),
+                        "type": self.rng.choices(["feedback", "question", "approval"], weights=[7, 2, 1])[0],
+                        "createdAt": self.moment(uploaded, 14),
+                    }
+
+            for _ in range(poisson(self.rng, self.sessions_per_project)):
+                studio, day, (start_time, end_time) = self.next_slot()
+                date = day.strftime("%Y-%m-%d")
+                if self.calendar_day != date:
+                    yield from self.flush_calendars(before_day=date)
+                    self.calendar_day = date
+                session_id = self.uid()
+                starts_at = parse_day(date).replace(hour=int(start_time[:2]))
+                ends_at = parse_day(date).replace(hour=int(end_time[:2]))
+                yield "sessions", {
+                    "id": session_id,
+                    "projectId": project_id,
+                    "title": self.rng.choice(["Tracking", "Overdubs", "Vocal Recording", "Mixing", "Editing"]),
+                    "studio": studio,
+                    "engineer": self.rng.choice(ENGINEERS),
+                    "date": date,
+                    "startTime": start_time,
+                    "endTime": end_time,
+                    "status": self.rng.choices(["scheduled", "completed", "cancelled"], weights=[3, 6, 1])[0],
+                    "startsAt": starts_at,
+                    "endsAt": ends_at,
+                    "createdAt": created,
+                    "updatedAt": created,
+                }
+                self.calendars.setdefault((studio, date), []).append(
+                    {"sessionId": session_id, "start": minutes(start_time), "end": minutes(end_time)})
+
+            sent = created
+            for _ in range(poisson(self.rng, self.messages_per_project)):
+                # Chat arrives in bursts: mostly seconds apart, occasionally days
+                sent += timedelta(seconds=self.rng.expovariate(1 / 90) if self.rng.random() < 0.9
+                                  else self.rng.expovariate(1 / 172800))
+                yield "messages", {
+                    "id": self.uid(),
+                    "projectId": project_id,
+                    "text": self.rng.choice(MESSAGES),
+                    "sender": self.rng.choice(MEMBERS),
+                    "createdAt": sent,
+                }
+
+            for n in range(poisson(self.rng, self.invoices_per_project)):
+                issued = self.moment(created, 90)
+                yield "invoices", {
+                    "id": self.uid(),
+                    "projectId": project_id,
+                    "number": f"INV-{index + 1:05d}-{n + 1}",
+                    "amount": round(project["budget"] * self.rng.uniform(0.1, 0.5), 2),
+                    "description": self.rng.choice(["Tracking days", "Mixing", "Mastering", "Studio hire"]),
+                    "status": self.rng.choices(["paid", "pending", "overdue"], weights=[7, 2, 1])[0],
+                    "paymentIntentId": f"pi_seed_{self.uid().replace('-', '')}",
+                    "createdAt": issued,
+                }
+        yield from self.flush_calendars()
+
+class MongoTarget:
+    """insert_many per batch straight into the database the API reads"""
+
+    def __init__(self, mongo_url, db_name, drop):
+        from pymongo import MongoClient
+        self.client = MongoClient(mongo_url)
+        if drop:
+            self.client.drop_database(db_name)
+        self.db = self.client[db_name]
+
+    def write(self, collection, docs):
+        self.db[collection].insert_many(docs, ordered=False)
+
+    def close(self, collections):
+        # Writes that bypass the API must still invalidate the ETags it handed out
+        for name in collections:
+            self.db.collectionVersions.update_one({"_id": name}, {"$inc": {"version": 1},
+                                                                  "$setOnInsert": {"epoch": int(time.time() * 1000)}},
+                                                  upsert=True)
+        self.client.close()
+
+class ApiTarget:
+    """Batches through the bulk endpoints where they exist, single POSTs otherwise.
+
+    The generated ids are kept (the API only assigns one when none is sent)
+    and double as Idempotency-Keys, so re-running a seed or retrying a batch
+    doesn't duplicate anything. Server-side timestamps replace createdAt.
+
+    POST invoices always creates a 'pending' invoice, and only a completed
+    Stripe or PayPal payment moves one to 'paid'; there is deliberately no
+    endpoint that sets the status directly. So the generated paid/overdue
+    statuses are dropped here, and anything filtering on them (e.g. the
+    dashboard's revenue total) sees a different dataset than MongoTarget
+    writes for the same seed.
+    """
+
+    BULK = {"sessions": "sessions/bulk", "audioFiles": "audio-files/bulk", "comments": "comments/bulk"}
+    SINGLE = {"projects": "projects", "messages": "messages", "invoices": "invoices"}
+
+    def __init__(self, base_url, concurrency):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, path, payload, key=None):
+        headers = {"Content-Type": "application/json"}
+        if key:
+            headers["Idempotency-Key"] = key
+        response = self.session.post(f"{self.base_url}/{path}", data=json.dumps(payload, default=to_json),
+                                     headers=headers, timeout=120)
+        if response.status_code >= 300:
+            raise RuntimeError(f"POST {path}: HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def write(self, collection, docs):
+        if collection in self.BULK:
+            result = self.post(self.BULK[collection], {"operations": [{"op": "create", "data": doc} for doc in docs]},
+                               key=f"seed-{collection}-{docs[0]['id']}")
+            if result["summary"]["failed"]:
+                failures = [r for r in result["results"] if not r["success"]][:3]
+                raise RuntimeError(f"{result['summary']['failed']} {collection} failed, e.g. {failures}")
+        elif collection in self.SINGLE:
+            for doc in docs:
+                self.post(self.SINGLE[collection], doc, key=f"seed-{doc['id']}")
+        # studioCalendars are derived: the API books each session's slot itself
+
+    def close(self, collections):
+        self.session.close()
+
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def run_seed(generator, target, batch_size, concurrency):
+    """Streams the generator into the target, keeping at most `concurrency` batches in flight"""
+    buffers = defaultdict(list)
+    counts = Counter()
+    in_flight = set()
+    lock = threading.Lock()
+    started = time.perf_counter()
+    last_report = started
+
+    def submit(pool, collection):
+        batch, buffers[collection] = buffers[collection], []
+        while len(in_flight) >= concurrency:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                future.result()
+        future = pool.submit(target.write, collection, batch)
+        in_flight.add(future)
+        def counted(_, n=len(batch)):
+            with lock:
+                counts[collection] += n
+        future.add_done_callback(counted)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for collection, doc in generator:
+            buffers[collection].append(doc)
+            if len(buffers[collection]) >= batch_size:
+                submit(pool, collection)
+            now = time.perf_counter()
+            if now - last_report > 5:
+                last_report = now
+                with lock:
+                    total = sum(counts.values())
+                print(f"  {total:>10,} documents  {total / (now - started):>8,.0f} docs/s  "
+                      f"peak RSS {peak_rss_mb():.0f} MB")
+        for collection in list(buffers):
+            if buffers[collection]:
+                submit(pool, collection)
+        for future in in_flight:
+            future.result()
+    target.close(list(counts))
+    return counts, time.perf_counter() - started
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic StudioMate dataset at scale")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"),
+                        help="insert straight into MongoDB (default $MONGO_URL)")
+    target.add_argument("--api", help="seed through the API at this root, e.g. http://127.0.0.1:3000/api")
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME", "studiomate_bench"), help="database for --mongo-url")
+    parser.add_argument("--drop", action="store_true", help="drop the database before seeding (--mongo-url only)")
+    parser.add_argument("--seed", type=int, default=42, help="same seed, same dataset")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--sessions-per-project", type=float, default=150)
+    parser.add_argument("--files-per-project", type=float, default=12)
+    parser.add_argument("--comments-per-file", type=float, default=20, help="mean of a heavy-tailed distribution")
+    parser.add_argument("--messages-per-project", type=float, default=100)
+    parser.add_argument("--invoices-per-project", type=float, default=3)
+    parser.add_argument("--start", default="2022-01-03", help="first day of the generated timeline (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=3 * 365, help="days over which projects are created")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per insert or bulk request")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight at once")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.mongo_url and not args.api:
+        raise SystemExit("Pass --mongo-url (or set MONGO_URL) or --api")
+    generator = DatasetGenerator(args.seed, args.projects, parse_day(args.start), args.days,
+                                 args.sessions_per_project, args.files_per_project, args.comments_per_file,
+                                 args.messages_per_project, args.invoices_per_project)
+    target = ApiTarget(args.api, args.concurrency) if args.api else MongoTarget(args.mongo_url, args.db_name, args.drop)
+
+    print("🚀 Seeding StudioMate dataset")
+    print("=" * 70)
+    print(f"  seed {args.seed}, {args.projects} projects, into {args.api or args.db_name}")
+    counts, elapsed = run_seed(generator, target, args.batch_size, args.concurrency)
+    total = sum(counts.values())
+    for collection, count in sorted(counts.items()):
+        print(f"  {collection:<16} {count:>12,}")
+    print(f"\n✅ {total:,} documents in {elapsed:.1f}s ({total / elapsed:,.0f} docs/s), "
+          f"peak RSS {peak_rss_mb():.0f} MB")
+    if args.api and counts["invoices"]:
+        print("  ℹ️  Invoices seeded through the API are all 'pending'; use --mongo-url for the generated statuses")
+    return counts
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+StudioMate Benchmark Suite
+Per-endpoint microbenchmarks and multi-request scenarios against a seeded
+dataset, compared with a baseline stored under tests/baselines/. Each
+benchmark is warmed up, then timed over several repetitions; a p95 that is
+both past the threshold and statistically distinguishable from the baseline
+fails the run, so a dropped index or a new collection scan is caught before
+it ships. Writes go to a scratch project created for the run and purged
+afterwards, so the measured dataset is the same on every run.
+
+    python -m tests.benchmark_suite --seed-projects 200 --update-baseline
+    python -m tests.benchmark_suite --base-url http://127.0.0.1:3000/api
+    python local_backend.py --bench -- --seed-projects 200
+
+A missing baseline fails the run unless --update-baseline records one or
+--allow-missing-baseline reports ungated results.
+
+Exit status: 0 when nothing regressed, 1 on a p95 regression, 2 when
+requests failed or the baseline was missing.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import requests
+
+import backend_test as harness
+import seed_dataset
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "local.json")
+OK_STATUSES = (200, 201, 202, 304)
+SCRATCH_PROJECT = "Benchmark Scratch"
+
+# `run(fixtures, rng)` performs one iteration and returns the responses it made
+Benchmark = namedtuple("Benchmark", "name kind run")
+
+class BenchmarkError(Exception):
+    pass
+
+def get(path, params=None, headers=None):
+    url = f"{harness.BASE_URL}/{path}" + (f"?{urlencode(params)}" if params else "")
+    return harness.timed_request("GET", url, headers=dict(harness.HEADERS, **(headers or {})), timeout=60)
+
+def post(path, payload):
+    return harness.timed_request("POST", f"{harness.BASE_URL}/{path}", json=payload, headers=harness.HEADERS, timeout=60)
+
+class Fixtures:
+    """Ids and values the benchmarks pick from, discovered from the seeded data,
+    plus a scratch project and file that receive the benchmarks' writes"""
+
+    def __init__(self):
+        projects = get("projects", {"limit": 200, "fields": "name"}).json()["data"]
+        # A run that died before cleaning up leaves its scratch project behind
+        projects = [project for project in projects if project.get("name") != SCRATCH_PROJECT]
+        if not projects:
+            raise BenchmarkError("No projects to benchmark against; seed some with --seed-projects")
+        self.project_ids = [project["id"] for project in projects]
+        self.files = []
+        for project_id in self.project_ids[:20]:
+            files = get("audio-files", {"projectId": project_id, "limit": 20, "fields": "duration"}).json()["data"]
+            self.files.extend(files)
+        sessions = get("sessions", {"limit": 200, "order": "desc", "fields": "studio,date"}).json()["data"]
+        self.slots = [(s["studio"], s["date"]) for s in sessions if s.get("studio") and s.get("date")]
+        if not self.files or not self.slots:
+            raise BenchmarkError("The dataset has no audio files or dated sessions; seed with seed_dataset.py")
+        response = get("projects", {"limit": 100})
+        self.projects_etag = response.headers.get("ETag")
+        self.scratch_project_id = self.scratch_file_id = None
+
+    def create_scratch(self):
+        response = post("projects", {"name": SCRATCH_PROJECT, "client": "Benchmark", "status": "active"})
+        if response.status_code != 200:
+            raise BenchmarkError(f"Could not create the scratch project: HTTP {response.status_code}")
+        self.scratch_project_id = response.json()["data"]["id"]
+        response = post("audio-files", {"name": "scratch.wav", "projectId": self.scratch_project_id, "size": 1024,
+                                        "duration": 600, "type": "recording"})
+        if response.status_code != 200:
+            raise BenchmarkError(f"Could not create the scratch file: HTTP {response.status_code}")
+        self.scratch_file_id = response.json()["data"]["id"]
+
+    def remove_scratch(self):
+        if not self.scratch_project_id:
+            return
+        try:
+            harness.timed_request("DELETE", f"{harness.BASE_URL}/projects/{self.scratch_project_id}",
+                                  headers=harness.HEADERS, timeout=60)
+        except requests.RequestException as e:
+            # The next run skips it by name
+            print(f"  ⚠️  Scratch project {self.scratch_project_id} not removed: {e}")
+
+    def week(self, rng):
+        studio, date = rng.choice(self.slots)
+        start = datetime.strptime(date, "%Y-%m-%d") - timedelta(days=3)
+        return studio, start.strftime("%Y-%m-%d"), (start + timedelta(days=6)).strftime("%Y-%m-%d")
+
+    def file_window(self, rng):
+        audio_file = rng.choice(self.files)
+        start = rng.uniform(0, max(0.0, (audio_file.get("duration") or 60) - 30))
+        return audio_file["id"], round(start, 1), round(start + 30, 1)
+
+def endpoint(name, request):
+    return Benchmark(name, "endpoint", lambda fixtures, rng: [request(fixtures, rng)])
+
+def scenario(name, *steps):
+    return Benchmark(name, "scenario", lambda fixtures, rng: [step(fixtures, rng) for step in steps])
+
+def week_sessions(fixtures, rng):
+    studio, start, end = fixtures.week(rng)
+    return get("sessions", {"studio": studio, "from": start, "to": end})
+
+def week_availability(fixtures, rng):
+    studio, start, end = fixtures.week(rng)
+    return get("availability", {"studio": studio, "from": start, "to": end})
+
+def comment_window(fixtures, rng):
+    file_id, start, end = fixtures.file_window(rng)
+    return get("comments", {"fileId": file_id, "from": start, "to": end})
+
+def new_comment(fixtures, rng):
+    return post("comments", {"projectId": fixtures.scratch_project_id, "fileId": fixtures.scratch_file_id,
+                             "timestamp": round(rng.uniform(0, 600), 1),
+                             "text": "Benchmark note", "author": "Benchmark", "type": "feedback"})
+
+BENCHMARKS = [
+    endpoint("GET projects", lambda f, rng: get("projects", {"limit": 100})),
+    endpoint("GET projects (304)", lambda f, rng: get("projects", {"limit": 100}, {"If-None-Match": f.projects_etag})),
+    endpoint("GET projects/{id}", lambda f, rng: get(f"projects/{rng.choice(f.project_ids)}")),
+    endpoint("GET sessions week", week_sessions),
+    endpoint("GET availability week", week_availability),
+    endpoint("GET audio-files by project", lambda f, rng: get("audio-files", {"projectId": rng.choice(f.project_ids)})),
+    endpoint("GET comments file window", comment_window),
+    endpoint("GET messages by project",
+             lambda f, rng: get("messages", {"projectId": rng.choice(f.project_ids), "limit": 100})),
+    endpoint("GET invoices", lambda f, rng: get("invoices", {"limit": 100})),
+    endpoint("GET dashboard-stats", lambda f, rng: get("dashboard-stats")),
+    endpoint("POST comments", new_comment),
+    scenario("open project",
+             lambda f, rng: get(f"projects/{f.project_ids[0]}"),
+             lambda f, rng: get("audio-files", {"projectId": f.project_ids[0]}),
+             lambda f, rng: get("comments", {"projectId": f.project_ids[0], "limit": 100}),
+             lambda f, rng: get("messages", {"projectId": f.project_ids[0], "limit": 50})),
+    scenario("review file", comment_window, comment_window, comment_window, new_comment),
+    scenario("plan week", week_sessions, week_availability),
+    scenario("dashboard",
+             lambda f, rng: get("dashboard-stats"),
+             lambda f, rng: get("projects", {"limit": 20}),
+             lambda f, rng: get("invoices", {"limit": 20})),
+]
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+def mann_whitney_greater(current, baseline):
+    """One-sided p-value that `current` tends to be larger than `baseline` (normal approximation, tie-corrected)"""
+    n1, n2 = len(current), len(baseline)
+    if not n1 or not n2:
+        return 1.0
+    pooled = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks, ties, i = [0.0] * len(pooled), 0.0, 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2.0 + 1
+        ties += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    u = sum(rank for rank, (_, group) in zip(ranks, pooled) if group == 0) - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def run_benchmark(benchmark, fixtures, rng, warmup, reps, iterations):
+    """Latencies in ms for every timed iteration, grouped by repetition, plus the error count"""
+    errors = 0
+    for _ in range(warmup):
+        benchmark.run(fixtures, rng)
+    repetitions = []
+    for _ in range(reps):
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            responses = benchmark.run(fixtures, rng)
+            samples.append((time.perf_counter() - started) * 1000.0)
+            errors += sum(response.status_code not in OK_STATUSES for response in responses)
+        repetitions.append(samples)
+    return repetitions, errors
+
+def summarize(repetitions):
+    samples = [value for rep in repetitions for value in rep]
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "stdev_ms": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        # The per-repetition p95s are what the significance test compares
+        "rep_p95_ms": [round(percentile(rep, 95), 3) for rep in repetitions],
+    }
+
+def compare(current, baseline, threshold, alpha, min_delta_ms):
+    """Verdict for one benchmark: 'new', 'ok', 'faster' or 'REGRESSED', with the ratio and p-value"""
+    if baseline is None:
+        return "new", None, None
+    ratio = current["p95_ms"] / baseline["p95_ms"] if baseline["p95_ms"] else float("inf")
+    p_value = mann_whitney_greater(current["rep_p95_ms"], baseline["rep_p95_ms"])
+    slower = current["p95_ms"] - baseline["p95_ms"]
+    if ratio > 1 + threshold and slower >= min_delta_ms and p_value < alpha:
+        return "REGRESSED", ratio, p_value
+    if ratio < 1 / (1 + threshold) and mann_whitney_greater(baseline["rep_p95_ms"], current["rep_p95_ms"]) < alpha:
+        return "faster", ratio, p_value
+    return "ok", ratio, p_value
+
+def load_baseline(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+def seed_through_api(projects, seed):
+    """A smaller-than-default dataset through the API, so fixtures exist on an empty deployment"""
+    generator = seed_dataset.DatasetGenerator(seed, projects, seed_dataset.parse_day("2022-01-03"), 365,
+                                              sessions_per_project=30, files_per_project=8, comments_per_file=15,
+                                              messages_per_project=40, invoices_per_project=3)
+    counts, elapsed = seed_dataset.run_seed(generator, seed_dataset.ApiTarget(harness.BASE_URL, 4), 500, 4)
+    print(f"  Seeded {sum(counts.values()):,} documents ({projects} projects, seed {seed}) in {elapsed:.1f}s")
+    return {"seed": seed, "projects": projects}
+
+def run_suite(args):
+    print("🚀 Starting StudioMate Benchmark Suite")
+    print("=" * 70)
+    print(f"  Target {harness.BASE_URL}")
+    baseline = load_baseline(args.baseline)
+    if baseline is None and not (args.update_baseline or args.allow_missing_baseline):
+        print(f"\n❌ No baseline at {os.path.relpath(args.baseline)}; record one with --update-baseline "
+              f"or pass --allow-missing-baseline")
+        return 2
+    dataset = seed_through_api(args.seed_projects, args.seed) if args.seed_projects else None
+    fixtures = Fixtures()
+    selected = [b for b in BENCHMARKS if not args.only or b.name in args.only]
+    if baseline is None:
+        print(f"  No baseline at {os.path.relpath(args.baseline)}; results are reported without gating")
+    elif dataset and baseline.get("dataset") and baseline["dataset"] != dataset:
+        print(f"  ⚠️  Baseline was recorded on dataset {baseline['dataset']}, this run uses {dataset}")
+
+    rng = random.Random(args.seed)
+    results, verdicts, failed_requests = {}, {}, 0
+    print(f"\n  {'benchmark':<30} {'kind':<9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'base p95':>9} {'change':>8} {'p':>7}  verdict")
+    try:
+        fixtures.create_scratch()
+        for benchmark in selected:
+            repetitions, errors = run_benchmark(benchmark, fixtures, rng, args.warmup, args.reps, args.iterations)
+            failed_requests += errors
+            summary = results[benchmark.name] = summarize(repetitions)
+            summary["kind"] = benchmark.kind
+            summary["errors"] = errors
+            base = (baseline or {}).get("benchmarks", {}).get(benchmark.name)
+            verdict, ratio, p_value = compare(summary, base, args.threshold, args.alpha, args.min_delta_ms)
+            verdicts[benchmark.name] = verdict if not errors else "ERRORS"
+            versus = (f"{base['p95_ms']:>9.1f} {(ratio - 1) * 100:>+7.1f}% {p_value:>7.3f}" if base
+                      else f"{'-':>9} {'-':>8} {'-':>7}")
+            print(f"  {benchmark.name:<30} {benchmark.kind:<9} {summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} "
+                  f"{summary['p99_ms']:>8.1f} {versus}  {verdicts[benchmark.name]}")
+    finally:
+        # Purging the scratch project removes every comment the run posted
+        fixtures.remove_scratch()
+
+    report = {
+        "generatedAt": datetime.now().isoformat(),
+        "baseUrl": harness.BASE_URL,
+        "dataset": dataset or (baseline or {}).get("dataset"),
+        "config": {"warmup": args.warmup, "reps": args.reps, "iterations": args.iterations},
+        "host": {"python": platform.python_version(), "platform": platform.platform()},
+        "benchmarks": results,
+    }
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\n📁 Results written to {args.report}")
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        merged = dict(report, benchmarks=dict((baseline or {}).get("benchmarks", {}), **results))
+        with open(args.baseline, "w") as fh:
+            json.dump(merged, fh, indent=2)
+            fh.write("\n")
+        print(f"\n📁 Baseline updated at {os.path.relpath(args.baseline)}")
+
+    regressed = [name for name, verdict in verdicts.items() if verdict == "REGRESSED"]
+    if failed_requests:
+        print(f"\n❌ {failed_requests} requests failed during the run")
+        return 2
+    if regressed and not args.update_baseline:
+        print(f"\n❌ p95 regressed more than {args.threshold:.0%} in: {', '.join(regressed)}")
+        return 1
+    print("\n🎉 No p95 regressions")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="StudioMate benchmark suite with baseline gating")
+    parser.add_argument("--base-url", help=f"API root (default $STUDIOMATE_BASE_URL or {harness.DEFAULT_BASE_URL})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with or update")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results into the baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="report results without gating when the baseline file is missing")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed p95 slowdown as a fraction (0.2 = 20%%)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="significance level for the per-repetition p95 test")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore p95 slowdowns smaller than this")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed iterations per benchmark")
+    parser.add_argument("--reps", type=int, default=7, help="timed repetitions per benchmark")
+    parser.add_argument("--iterations", type=int, default=30, help="iterations per repetition")
+    parser.add_argument("--only", type=lambda value: set(value.split(",")), help="comma separated benchmark names")
+    parser.add_argument("--seed-projects", type=int, default=0, help="seed this many projects through the API first")
+    parser.add_argument("--seed", type=int, default=42, help="dataset and request-mix seed")
+    parser.add_argument("--report", help="also write this run's results to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.base_url:
+        harness.BASE_URL = args.base_url.rstrip("/")
+    try:
+        return run_suite(args)
+    except (BenchmarkError, requests.RequestException) as e:
+        print(f"❌ {e}")
+        return 2
+
+if __name__ == "__main__":
+    raise SystemExit(main())